@@ -10,13 +10,14 @@ from routers import scrape as scrape_router
 from routers import seo as seo_router
 from dotenv import load_dotenv
 load_dotenv()
+import db
 import scrapper
 import seo_logic
-import subprocess
+import scrape_worker
 
 # --- Path helpers ---
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DB_PATH = os.path.join(BASE_DIR, 'products_data.db')
+DB_PATH = db.DB_FILE
 SEO_ANALYTICS_PATH = os.path.join(BASE_DIR, 'output', 'seo_analytics.json')
 QUERY_HISTORY_PATH = os.path.join(BASE_DIR, 'output', 'query_history.json')
 REPORT_PATH = os.path.join(BASE_DIR, 'result', 'report.txt')
@@ -89,16 +90,17 @@ def planner_node(state: BazaarIntelState):
 
 def scrape_node(state: BazaarIntelState):
     print(f"[SCRAPE] Scraping {state.count} products for {state.brand.title()}...")
-    result = subprocess.run(
-        [sys.executable, os.path.join(BASE_DIR, 'scrapper.py'), '--brand', state.brand, '--count', str(state.count)],
-        capture_output=True, text=True
-    )
-    if result.returncode != 0:
-        print(f"[SCRAPE] ERROR: Scraper failed for {state.brand.title()} (exit code {result.returncode})")
-        state.result = f"Scraper failed for {state.brand} (exit code {result.returncode})"
+    job = scrape_worker.get_worker().submit(state.brand, state.count)
+    try:
+        result = job.wait()
+    except Exception as e:
+        print(f"[SCRAPE] ERROR: Scraper failed for {state.brand.title()} ({e})")
+        state.result = f"Scraper failed for {state.brand} ({e})"
         return state
-    print(f"[SCRAPE] Done: {state.count} products scraped for {state.brand.title()}.")
-    state.result = f"Scraped products for {state.brand}"
+    print(f"[SCRAPE] Done: {result['count']} products scraped for {state.brand.title()}.")
+    state.result = f"Scraped {result['count']} products for {state.brand}"
+    if result['failed_urls']:
+        state.result += f" ({len(result['failed_urls'])} failed)"
     return state
 
 def seo_node(state: BazaarIntelState):
@@ -110,12 +112,8 @@ def seo_node(state: BazaarIntelState):
 
 def store_node(state: BazaarIntelState):
     print(f"[STORE] Verifying data storage...")
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM products")
-    count = c.fetchone()[0]
-    conn.close()
+    with db.reader(DB_PATH) as conn:
+        count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
     print(f"[STORE] Data stored: {count} total products in database.")
     state.result = f"Data stored in products_data.db (total products: {count})"
     return state
@@ -130,13 +128,10 @@ def report_node(state: BazaarIntelState):
     except Exception:
         query_history = []
     # Fetch products for the brand (most recent N)
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM products WHERE brand = ? ORDER BY rowid DESC LIMIT ?", (state.brand, state.count))
-    columns = [desc[0] for desc in c.description]
-    products = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
+    with db.reader(DB_PATH) as conn:
+        c = conn.execute("SELECT * FROM products WHERE brand = ? ORDER BY scraped_at DESC, id DESC LIMIT ?", (state.brand, state.count))
+        columns = [desc[0] for desc in c.description]
+        products = [dict(zip(columns, row)) for row in c.fetchall()]
     # Pass products to report generator
     report = report_gen.generate_report(state.goal, seo_data={
         "seo_analytics": seo_analytics,
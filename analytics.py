@@ -0,0 +1,152 @@
+"""Optional DuckDB execution of aggregate queries over the Parquet export.
+
+With ``ANALYTICS_ENGINE=duckdb`` (and duckdb installed, and export.py run at
+least once), aggregate queries -- GROUP BY or COUNT/SUM/AVG/MIN/MAX -- are
+answered by DuckDB from the columnar export instead of SQLite's row store.
+The export's ``products`` and ``price_history`` datasets are exposed as
+views with the same names and columns as the SQLite tables (plus the
+``brand_key``/``day`` partition columns), so the same SQL runs on either
+engine. Full-text queries, everything else, and any query DuckDB rejects
+run on the live SQLite database, as do all queries once the database has
+been written to since the export, so DuckDB never answers from stale data.
+
+The DuckDB connection may read only the export directory: external access
+is disabled and the configuration locked once the views exist, and only a
+single SELECT statement is accepted, so generated SQL cannot read other
+files on the server or write anywhere.
+"""
+import json
+import logging
+import os
+import re
+import threading
+
+import db
+from export import EXPORT_DIR, source_mtime
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ENGINE = os.getenv('ANALYTICS_ENGINE', 'sqlite').strip().lower()
+DATASETS = ['products', 'price_history', 'seo_scores']
+
+AGGREGATE_PATTERN = re.compile(r'\bGROUP\s+BY\b|\b(COUNT|SUM|AVG|MIN|MAX)\s*\(', re.IGNORECASE)
+
+def is_aggregate(sql):
+    # products_fts only exists in SQLite
+    return bool(AGGREGATE_PATTERN.search(sql)) and 'products_fts' not in sql.lower()
+
+class DuckDBEngine:
+    """In-memory DuckDB database with views over the Parquet export.
+
+    The views are recreated when the export's manifest changes; queries run on
+    per-call cursors of one shared connection.
+    """
+
+    def __init__(self, export_dir=EXPORT_DIR):
+        self.export_dir = export_dir
+        self._conn = None
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.export_dir, 'manifest.json')
+
+    def available(self):
+        return duckdb is not None and os.path.exists(self.manifest_path)
+
+    def _connection(self):
+        with self._lock:
+            stamp = os.path.getmtime(self.manifest_path)
+            if self._conn is None or stamp != self._manifest:
+                if self._conn is not None:
+                    self._conn.close()
+                conn = duckdb.connect(':memory:')
+                for name in DATASETS:
+                    path = os.path.join(self.export_dir, name)
+                    if os.path.isdir(path):
+                        pattern = os.path.join(path, '**', '*.parquet').replace("'", "''")
+                        conn.execute(f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{pattern}', "
+                                     f"hive_partitioning = true, hive_types = {{'brand_key': VARCHAR, 'day': VARCHAR}})")
+                export_dir = os.path.join(os.path.abspath(self.export_dir), '').replace("'", "''")
+                conn.execute(f"SET allowed_directories = ['{export_dir}']")
+                conn.execute("SET enable_external_access = false")
+                conn.execute("SET lock_configuration = true")
+                self._conn = conn
+                self._manifest = stamp
+                with open(self.manifest_path, encoding='utf-8') as f:
+                    logger.info(f"DuckDB views refreshed from export of {json.load(f).get('exported_at')}")
+            return self._conn.cursor()
+
+    def is_fresh(self, filename):
+        """True when the export was taken from ``filename`` and nothing has been written to it since."""
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return (manifest.get('source') == os.path.abspath(filename)
+                and source_mtime(filename) <= manifest.get('source_mtime', 0))
+
+    def query(self, sql, params=()):
+        cursor = self._connection()
+        try:
+            statements = cursor.extract_statements(sql)
+            if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+                raise duckdb.InvalidInputException("Only a single SELECT statement runs on DuckDB")
+            cursor.execute(sql, list(params))
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            return columns, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_engine = None
+_warned = False
+
+def duckdb_engine():
+    """The process-wide DuckDBEngine when ANALYTICS_ENGINE=duckdb and it can run, otherwise None."""
+    global _engine, _warned
+    if ANALYTICS_ENGINE != 'duckdb':
+        return None
+    if _engine is None:
+        _engine = DuckDBEngine()
+    if not _engine.available():
+        if not _warned:
+            logger.warning("ANALYTICS_ENGINE=duckdb needs the duckdb package and an export (python export.py); using SQLite")
+            _warned = True
+        return None
+    return _engine
+
+def run_query(sql, params=(), filename=db.DB_FILE):
+    """Run a read-only query, on DuckDB when enabled and ``sql`` is an aggregate.
+
+    Returns ``(engine, columns, rows)`` where engine is 'duckdb' or 'sqlite'.
+    """
+    engine = duckdb_engine() if is_aggregate(sql) else None
+    if engine is not None and not engine.is_fresh(filename):
+        logger.info("Parquet export is older than the database; running the aggregate on SQLite")
+        engine = None
+    if engine is not None:
+        try:
+            return ('duckdb',) + engine.query(sql, params)
+        except duckdb.Error as e:
+            logger.warning(f"DuckDB could not run the query ({e}); falling back to SQLite")
+    with db.reader(filename) as conn:
+        cursor = conn.execute(sql, params)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        return 'sqlite', columns, cursor.fetchall()
+
+def close():
+    if _engine is not None:
+        _engine.close()
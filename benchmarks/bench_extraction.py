@@ -0,0 +1,213 @@
+"""Per-page latency and browser round trips of compiled vs per-selector product field extraction.
+
+Times both extractors on product pages in headless Chromium and checks they
+return the same fields. Pages come from, in order of preference:
+
+  --url      a live product page
+  --html     a saved product page, served at the brand's URL so the
+             Khaadi/Alkaram special cases still apply
+  fixtures   every product page benchmarks/replay.py recorded for the brand,
+             served at their original URLs
+  (default)  a small built-in product page for the brand
+
+Every awaited page or element handle call is one round trip to the browser
+(page.url is local). --rtt-ms adds that much delay to each of them, to model a
+browser reached over the network (connect_over_cdp, a remote grid).
+
+Chromium has to be installed once: python -m playwright install chromium
+(or pass --executable-path to use a Chrome/Chromium that is already installed).
+
+    python benchmarks/bench_extraction.py --brand khaadi
+    python benchmarks/bench_extraction.py --brand khaadi --url https://pk.khaadi.com/<product>.html
+    python benchmarks/bench_extraction.py --brand alkaram --html saved_product.html --runs 50
+    python benchmarks/bench_extraction.py --brand outfitters --rtt-ms 5
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from playwright.async_api import async_playwright, ElementHandle, Page
+import scrapper
+from replay import FIXTURES_DIR, load_fixture, percentile
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body>
+<header><nav>{nav}</nav></header>
+<main>{product}</main>
+<footer>{nav}</footer>
+</body></html>"""
+NAV = ''.join(f'<a href="/collections/c{i}">Collection {i}</a>' for i in range(40))
+DESCRIPTION = ("Embroidered lawn shirt with a round neckline and full sleeves. "
+               "<b>Material:</b> Lawn<br>Care: dry clean only.")
+SAMPLE_PRODUCTS = {
+    'khaadi': ('Khaadi', f"""<div class="product-brand">Khaadi</div><h1 class="product-name">Printed Lawn Shirt</h1>
+        <span class="value cc-price">PKR 4,990</span>
+        <ul><li><span><strong>Description:</strong> {DESCRIPTION}</span></li><li><span><strong>Fit:</strong> Regular</span></li></ul>"""),
+    'outfitters': ('Outfitters', f"""<div class="product__title"><h1>Relaxed Fit Shirt</h1></div><span class="money">PKR 3,490</span>
+        <div class="pdp-description"><p><span class="metafield-multi_line_text_field">{DESCRIPTION}</span></p></div>"""),
+    'sana_safinaz': ('Sana Safinaz', f"""<span class="base" itemprop="name">Unstitched 3 Piece</span><span class="price">PKR 8,990</span>
+        <div class="product attribute description"><p>{DESCRIPTION}</p></div>"""),
+    'alkaram': ('Alkaram Studio', f"""<h1 class="t4s-product__title">Printed Cambric Suit</h1><div class="t4s-product-price">PKR 5,990</div>
+        <div id="t4s-tab-destemplate--16602647167156__main"><p>{DESCRIPTION}</p>
+        <div class="tab--disclaimer">Actual colours may vary slightly from the image.</div></div>"""),
+    'breakout': ('Breakout', f"""<h1 class="product__title heading-medium"><span data-zoom-caption>Graphic Tee</span></h1>
+        <div class="product__price"><span data-product-price>PKR 1,990</span></div>
+        <p><span style="font-size:12px">{DESCRIPTION}</span></p>"""),
+}
+EXTRACTORS = [
+    ('per-selector', scrapper.extract_fields_per_selector),
+    ('compiled', scrapper.extract_fields_from_product_page),
+]
+
+
+class RoundTripCounter:
+    """Counts (and optionally delays) the awaited calls made through wrapped pages and element handles."""
+
+    def __init__(self, delay_ms=0):
+        self.count = 0
+        self.delay = delay_ms / 1000
+
+    def wrap(self, value):
+        if isinstance(value, list):
+            return [self.wrap(item) for item in value]
+        if isinstance(value, (Page, ElementHandle)):
+            return _Counted(value, self)
+        return value
+
+
+class _Counted:
+    def __init__(self, target, counter):
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            self._counter.count += 1
+            if self._counter.delay:
+                await asyncio.sleep(self._counter.delay)
+            return self._counter.wrap(await attr(*unwrap(args), **unwrap(kwargs)))
+        return call
+
+
+def unwrap(value):
+    if isinstance(value, _Counted):
+        return value._target
+    if isinstance(value, dict):
+        return {key: unwrap(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(unwrap(item) for item in value)
+    return value
+
+
+def served_pages(args, brand_conf):
+    """{url: html} to serve through page.route, or {url: None} to load --url from the network."""
+    if args.url and not args.html:
+        return {args.url: None}
+    base_url = brand_conf['base_url'][0] if isinstance(brand_conf['base_url'], list) else brand_conf['base_url']
+    url = args.url or base_url.rstrip('/') + '/benchmark-product'
+    if args.html:
+        with open(args.html, encoding='utf-8') as f:
+            return {url: f.read()}
+    directory = os.path.join(args.fixtures, args.brand)
+    if os.path.exists(os.path.join(directory, 'manifest.json')):
+        pages = {}
+        for page_url, entry in load_fixture(directory).items():
+            if entry['content_type'].startswith('text/html'):
+                with open(os.path.join(directory, 'bodies', entry['file']), encoding='utf-8', errors='replace') as f:
+                    pages[page_url] = f.read()
+        return pages
+    if args.brand not in SAMPLE_PRODUCTS:
+        sys.exit(f"No built-in page for {args.brand}; pass --url or --html, or record fixtures with benchmarks/replay.py")
+    title, product = SAMPLE_PRODUCTS[args.brand]
+    return {url: PAGE_TEMPLATE.format(title=title, nav=NAV, product=product)}
+
+
+async def bench_page(page, conf, runs, counter):
+    """{extractor: (per-call ms timings, round trips per call, fields)} for the loaded page."""
+    results = {}
+    for name, extractor in EXTRACTORS:
+        # Warm up so script compilation and selector caches are not timed
+        await extractor(page, conf)
+        counter.count = 0
+        timings = []
+        data = None
+        for _ in range(runs):
+            started = time.perf_counter()
+            data = await extractor(counter.wrap(page), conf)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (timings, counter.count / runs, data)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--brand', required=True, help='Brand key in scrape_struct.json')
+    parser.add_argument('--url', help='Product URL to load (also the URL a --html file is served at)')
+    parser.add_argument('--html', help='Saved product page to serve instead of hitting the network')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Replay fixture directory')
+    parser.add_argument('--runs', type=int, default=20, help='Timed calls per extractor and page')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='Delay added to every browser round trip')
+    parser.add_argument('--executable-path', help="Chrome/Chromium binary to launch instead of Playwright's own")
+    args = parser.parse_args()
+    config = scrapper.load_config(os.path.join(os.path.dirname(__file__), '..', 'scrape_struct.json'))
+    brand_conf = config[args.brand]
+    conf = brand_conf['product_page']
+    pages = served_pages(args, brand_conf)
+    counter = RoundTripCounter(args.rtt_ms)
+    timings = {name: [] for name, _ in EXTRACTORS}
+    round_trips = {name: [] for name, _ in EXTRACTORS}
+    measured = 0
+    mismatches = []
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=scrapper.BROWSER_ARGS, executable_path=args.executable_path)
+        page = await browser.new_page()
+
+        async def fulfill(route):
+            html = pages.get(route.request.url)
+            if html is None:
+                await route.abort()
+            else:
+                await route.fulfill(body=html, content_type='text/html; charset=utf-8')
+
+        if any(html is not None for html in pages.values()):
+            await page.route('**/*', fulfill)
+        for url in pages:
+            await page.goto(url, wait_until='domcontentloaded', timeout=60000)
+            results = await bench_page(page, conf, args.runs, counter)
+            before_data = results['per-selector'][2]
+            if 'name' not in before_data:
+                continue  # A listing page among the recorded fixtures
+            measured += 1
+            for name, (page_timings, page_round_trips, data) in results.items():
+                timings[name].extend(page_timings)
+                round_trips[name].append(page_round_trips)
+                if data != before_data:
+                    mismatches.append((url, before_data, data))
+        await browser.close()
+    if not measured:
+        sys.exit("No product pages found")
+    print(f"{args.brand}: {measured} product page(s), {args.runs} runs each, {args.rtt_ms:g} ms added per round trip")
+    for name, _ in EXTRACTORS:
+        print(f"  {name:<13} mean {statistics.mean(timings[name]):7.2f} ms  p50 {percentile(timings[name], 50):7.2f} ms  "
+              f"p95 {percentile(timings[name], 95):7.2f} ms  {statistics.mean(round_trips[name]):4.1f} round trips/page")
+    print(f"  speedup       {statistics.mean(timings['per-selector']) / statistics.mean(timings['compiled']):.1f}x")
+    if mismatches:
+        url, before_data, after_data = mismatches[0]
+        print(f"  WARNING: extractors disagree on {len(mismatches)} page(s), e.g. {url}")
+        print(f"    per-selector: {json.dumps(before_data, ensure_ascii=False)}")
+        print(f"    compiled:     {json.dumps(after_data, ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
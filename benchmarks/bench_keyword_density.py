@@ -0,0 +1,86 @@
+"""Keyword counting cost as the keyword list grows, and legacy vs phrase density.
+
+Counts keyword hits in pre-tokenized synthetic descriptions with:
+
+  original  the first count_occurrences: list.count per keyword word, a full
+            scan of the tokens for each (O(keywords x words x tokens))
+  legacy    count_occurrences on the description's token Counter
+  phrase    KeywordMatcher, one pass over the tokens whatever the keyword count
+
+then prints how keyword_density_score buckets move between the 'legacy' and
+'phrase' density modes for the same descriptions and keywords.
+
+    python benchmarks/bench_keyword_density.py
+    python benchmarks/bench_keyword_density.py --keywords 10 100 1000 --size 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import seo_logic
+
+BRAND = 'Khaadi'
+WORDS = [
+    'lawn', 'cotton', 'cambric', 'chiffon', 'jacquard', 'embroidered', 'printed', 'floral', 'kurta', 'shirt',
+    'trousers', 'dupatta', 'neckline', 'sleeves', 'with', 'and', 'the', 'in', 'for', 'elegant', 'vibrant',
+    'classic', 'traditional', 'casual', 'relaxed', 'fit', 'unstitched', 'soft', 'breathable', 'summer',
+]
+
+
+def synthetic_tokens(size, seed=0, length=120):
+    rng = random.Random(seed)
+    return [[rng.choice(WORDS) for _ in range(rng.randint(length // 2, length))] for _ in range(size)]
+
+
+def synthetic_keywords(count, seed=0):
+    """Keyword phrases of one to three words, like the extracted seo_keywords.json lists."""
+    rng = random.Random(seed)
+    return list(dict.fromkeys(' '.join(rng.choice(WORDS) for _ in range(rng.choice([1, 2, 2, 3])))
+                              for _ in range(count)))
+
+
+def original_count_occurrences(keywords, text_tokens):
+    count = 0
+    for kw in keywords:
+        for word in kw.split():
+            count += text_tokens.count(word)
+    return count
+
+
+def timed(run):
+    started = time.perf_counter()
+    result = run()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keywords', type=int, nargs='+', default=[10, 100, 1000], help='Keyword list sizes')
+    parser.add_argument('--size', type=int, default=2000, help='Descriptions per run')
+    args = parser.parse_args()
+    descriptions = synthetic_tokens(args.size)
+    for count in args.keywords:
+        keywords = synthetic_keywords(count)
+        print(f"{len(keywords)} keywords, {args.size} descriptions")
+        baseline, _ = timed(lambda: [original_count_occurrences(keywords, tokens) for tokens in descriptions])
+        legacy, _ = timed(lambda: [seo_logic.count_occurrences(keywords, Counter(tokens)) for tokens in descriptions])
+        seo_logic.keyword_matcher.cache_clear()  # Include compiling the trie
+        phrase, _ = timed(lambda: [seo_logic.keyword_matcher(tuple(keywords)).count(tokens) for tokens in descriptions])
+        for name, elapsed in [('original', baseline), ('legacy', legacy), ('phrase', phrase)]:
+            print(f"  {name:<9} {elapsed:7.3f} s  {elapsed / args.size * 1e6:8.1f} us/description  {baseline / elapsed:6.1f}x")
+
+    keyword_map = {BRAND: synthetic_keywords(args.keywords[0])}
+    texts = [' '.join(tokens).capitalize() + '.' for tokens in descriptions[:500]]
+    moves = Counter((seo_logic.keyword_density_score(text, BRAND, keyword_map, 'legacy'),
+                     seo_logic.keyword_density_score(text, BRAND, keyword_map, 'phrase')) for text in texts)
+    print(f"keyword_density legacy -> phrase, {len(keyword_map[BRAND])} keywords, {len(texts)} descriptions")
+    for (legacy_score, phrase_score), n in sorted(moves.items()):
+        print(f"  {legacy_score:>3} -> {phrase_score:>3}  {n}")
+
+
+if __name__ == "__main__":
+    main()
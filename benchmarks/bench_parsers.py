@@ -0,0 +1,133 @@
+"""Per-description cost of the HTML parser backends used for description cleaning.
+
+Times BeautifulSoup (html.parser and lxml builders), plain lxml.html (what
+scrapper.description_text uses) and selectolax when it is installed, on
+captured description HTML, and checks every backend returns the same text as
+the original BeautifulSoup/html.parser version.
+
+Descriptions come from saved fragments (--html, repeatable) or from pages
+recorded by benchmarks/replay.py (--fixtures/--brand, cut out with the brand's
+description selector):
+
+    python benchmarks/bench_parsers.py --html desc1.html --html desc2.html --runs 500
+    python benchmarks/bench_parsers.py --brand outfitters --runs 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from bs4 import BeautifulSoup
+import scrapper
+from replay import FIXTURES_DIR, percentile
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+SAMPLE_DESCRIPTION = (
+    '<div class="tab tab--description"><p>Lawn shirt with <strong>embroidered</strong> neckline &amp; '
+    'printed sleeves.</p><ul><li>Fabric: Lawn</li><li>Material: Cotton&nbsp;blend</li><li>Fit: Regular</li>'
+    '</ul><!-- care --><p>Machine wash cold.<br>Do not bleach.</p><script>window.x = 1;</script></div>'
+    '<div class="tab--disclaimer">Disclaimer: Due to the difference in lighting used during photoshoots, '
+    'the color or texture of the actual product may slightly vary from the image.</div>'
+)
+
+
+def bs4_text(parser):
+    def parse(desc_html, url):
+        soup = BeautifulSoup(desc_html, parser)
+        if 'alkaram' in url or 'alkaramstudio' in url:
+            disclaimer_div = soup.find('div', class_='tab--disclaimer')
+            if disclaimer_div:
+                disclaimer_div.decompose()
+        return scrapper.clean_text(soup.get_text(separator=' ', strip=True))
+    return parse
+
+
+def selectolax_text(desc_html, url):
+    tree = HTMLParser(desc_html)
+    for node in tree.css('script, style'):
+        node.decompose()
+    if 'alkaram' in url or 'alkaramstudio' in url:
+        disclaimer = tree.css_first('div.tab--disclaimer')
+        if disclaimer:
+            disclaimer.decompose()
+    root = tree.body or tree.root
+    parts = [node.text(deep=False).strip() for node in root.traverse(include_text=True) if node.tag == '-text']
+    return scrapper.clean_text(' '.join(part for part in parts if part))
+
+
+def fixture_descriptions(directory, product_page_conf):
+    selector = product_page_conf.get('description_selector')
+    if not selector or not scrapper.is_css_selector(selector):
+        sys.exit(f"Description selector {selector!r} cannot be applied to static HTML; pass --html fragments instead")
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    descriptions = []
+    for url, entry in manifest.items():
+        if not entry['content_type'].startswith('text/html'):
+            continue
+        with open(os.path.join(directory, 'bodies', entry['file']), encoding='utf-8', errors='replace') as f:
+            el = BeautifulSoup(f.read(), 'lxml').select_one(selector)
+        if el:
+            descriptions.append((url, el.decode_contents()))
+    return descriptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--html', action='append', default=[], help='Saved description fragment (repeatable)')
+    parser.add_argument('--brand', help='Brand whose recorded replay fixtures provide the descriptions')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Replay fixture directory')
+    parser.add_argument('--url', default='https://www.alkaramstudio.com/benchmark', help='URL passed with --html fragments')
+    parser.add_argument('--runs', type=int, default=200, help='Passes over the descriptions per backend')
+    args = parser.parse_args()
+    if args.brand:
+        config = scrapper.load_config(os.path.join(os.path.dirname(__file__), '..', 'scrape_struct.json'))
+        descriptions = fixture_descriptions(os.path.join(args.fixtures, args.brand), config[args.brand]['product_page'])
+    elif args.html:
+        descriptions = []
+        for path in args.html:
+            with open(path, encoding='utf-8') as f:
+                descriptions.append((args.url, f.read()))
+    else:
+        descriptions = [(args.url, SAMPLE_DESCRIPTION)]
+    if not descriptions:
+        sys.exit("No descriptions found")
+
+    backends = {
+        'bs4/html.parser': bs4_text('html.parser'),
+        'bs4/lxml': bs4_text('lxml'),
+        'lxml.html': scrapper.description_text,
+    }
+    if HTMLParser is not None:
+        backends['selectolax'] = selectolax_text
+    expected = [backends['bs4/html.parser'](html, url) for url, html in descriptions]
+
+    print(f"{len(descriptions)} descriptions, {args.runs} runs, "
+          f"{statistics.mean(len(html) for _, html in descriptions):.0f} bytes on average")
+    baseline = None
+    for name, parse in backends.items():
+        timings = []
+        for _ in range(args.runs):
+            for url, html in descriptions:
+                started = time.perf_counter()
+                parse(html, url)
+                timings.append((time.perf_counter() - started) * 1e6)
+        mean = statistics.mean(timings)
+        baseline = baseline or mean
+        mismatches = sum(parse(html, url) != text for (url, html), text in zip(descriptions, expected))
+        print(f"  {name:<16} mean {mean:8.1f} us  p50 {percentile(timings, 50):8.1f} us  "
+              f"p95 {percentile(timings, 95):8.1f} us  {baseline / mean:5.1f}x"
+              f"{f'  ({mismatches} differ from bs4/html.parser)' if mismatches else ''}")
+    if HTMLParser is None:
+        print("  selectolax       not installed (pip install selectolax)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Per-description cost of seo_logic scoring, per-scorer analysis vs AnalyzedDoc.
+
+Scores a synthetic brand corpus three ways, then checks they agree exactly:
+
+  per-scorer  each scorer called with the plain description, so every one
+              tokenizes and splits it again (how seo_scores used to work)
+  analyzed    seo_scores, one AnalyzedDoc shared by the five scorers
+  batch       seo_scores_batch over the whole corpus
+
+All three use one UniquenessIndex built up front, so the numbers isolate
+the text analysis.
+
+    python benchmarks/bench_seo_scores.py
+    python benchmarks/bench_seo_scores.py --size 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import seo_logic
+
+BRAND = 'Khaadi'
+KEYWORD_MAP = {BRAND: ['embroidered lawn', 'floral print', 'kurta', 'unstitched 3-piece', 'cotton']}
+WORDS = [
+    'lawn', 'cotton', 'cambric', 'chiffon', 'jacquard', 'embroidered', 'printed', 'floral', 'kurta', 'shirt',
+    'trousers', 'dupatta', 'neckline', 'sleeves', 'with', 'and', 'the', 'a', 'in', 'for', 'elegant', 'vibrant',
+    'classic', 'traditional', 'casual', 'relaxed', 'fit', 'unstitched', '3-piece', 'soft', 'breathable', 'summer',
+]
+
+
+def synthetic_descriptions(size, seed=0):
+    """Product descriptions of 3-8 sentences, some with a call to action or a paragraph break."""
+    rng = random.Random(seed)
+    descriptions = []
+    for _ in range(size):
+        sentences = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 18))).capitalize() + rng.choice('..!')
+                     for _ in range(rng.randint(3, 8))]
+        if rng.random() < 0.3:
+            sentences.append('Shop now.')
+        descriptions.append(rng.choice([' ', '\n']).join(sentences))
+    return descriptions
+
+
+def run_per_scorer(descriptions, index):
+    brand = BRAND.strip().title()
+    return [{
+        "keyword_density": seo_logic.keyword_density_score(description, brand, KEYWORD_MAP),
+        "content_quality": seo_logic.content_quality_score(description),
+        "brand_consistency": seo_logic.brand_consistency_score(description, brand),
+        "uniqueness": seo_logic.uniqueness_score(description, brand, index=index),
+        "readability": seo_logic.readability_score(description),
+    } for description in descriptions]
+
+
+def run_analyzed(descriptions, index):
+    return [seo_logic.seo_scores(description, BRAND, KEYWORD_MAP, uniqueness_index=index) for description in descriptions]
+
+
+def run_batch(descriptions, index):
+    return seo_logic.seo_scores_batch(descriptions, BRAND, KEYWORD_MAP, uniqueness_index=index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=500, help='Descriptions in the corpus')
+    args = parser.parse_args()
+    methods = [('per-scorer', run_per_scorer), ('analyzed', run_analyzed), ('batch', run_batch)]
+    print(f"{args.size} descriptions")
+    baseline = None
+    for seed, (name, run) in enumerate(methods):
+        # A fresh corpus per method: textstat caches its results per text
+        descriptions = synthetic_descriptions(args.size, seed=seed)
+        index = seo_logic.UniquenessIndex(descriptions)
+        started = time.perf_counter()
+        run(descriptions, index)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"  {name:<11} {elapsed:7.2f} s  {elapsed / args.size * 1e6:7.0f} us/description  {baseline / elapsed:4.1f}x")
+    descriptions = synthetic_descriptions(args.size, seed=len(methods))
+    index = seo_logic.UniquenessIndex(descriptions)
+    results = [run(descriptions, index) for _, run in methods]
+    print("  scores identical" if all(scores == results[0] for scores in results) else "  SCORES DIFFER")
+
+
+if __name__ == "__main__":
+    main()
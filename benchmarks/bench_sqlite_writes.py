@@ -0,0 +1,111 @@
+"""Rows/sec of product saves: the old per-row TEXT inserts vs batched upserts.
+
+Writes synthetic products into a fresh database in checkpoint-sized batches
+(one transaction per batch, like ScrapeRun.flush) and reports throughput for
+each write path. "legacy" reproduces the original save_to_sqlite: a new
+connection per batch, PRAGMA table_info plus CREATE TABLE on every call,
+per-row INSERT strings and the rollback journal. "batched" is
+scrapper.insert_products on a db.connect() connection (WAL, tuned pragmas,
+one executemany per batch); "batched-journal" is the same with the rollback
+journal, to separate the WAL gain from the batching gain. The batched paths
+also maintain the unique url index, price_history, the daily observations and
+rollups (db.record_observations, once per batch) and, through one
+sync_products_fts at the end as ScrapeRun's final checkpoint does, the
+full-text index; the unindexed legacy table pays for none of them.
+
+    python benchmarks/bench_sqlite_writes.py
+    python benchmarks/bench_sqlite_writes.py --rows 10000 --rows 100000 --batch 20
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import db
+import scrapper
+
+BRANDS = ['Khaadi', 'Outfitters', 'Breakout', 'Sana Safinaz', 'Alkaram Studio']
+
+
+def synthetic_products(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'brand': rng.choice(BRANDS),
+        'name': f"Printed Lawn Shirt {i}",
+        'price': float(rng.randrange(1500, 15000, 10)),
+        'description': ' '.join(rng.choice(['lawn', 'cotton', 'printed', 'embroidered', 'regular', 'fit', 'shirt', 'kurta'])
+                                for _ in range(40)),
+        'material': rng.choice(['Lawn', 'Cotton', 'Cambric', None]),
+        'url': f"https://example.com/products/{i}",
+    } for i in range(count)]
+
+
+def legacy_save(filename, data):
+    conn = sqlite3.connect(filename)
+    c = conn.cursor()
+    all_keys = sorted({k for d in data for k in d.keys()})
+    c.execute(f"CREATE TABLE IF NOT EXISTS legacy_products ({', '.join(f'{k} TEXT' for k in all_keys)})")
+    c.execute('PRAGMA table_info(legacy_products)')
+    existing = {row[1] for row in c.fetchall()}
+    for k in all_keys:
+        if k not in existing:
+            c.execute(f'ALTER TABLE legacy_products ADD COLUMN "{k}" TEXT')
+    for row in data:
+        quoted_keys = ', '.join([f'"{k}"' for k in all_keys])
+        placeholders = ', '.join(['?'] * len(all_keys))
+        c.execute(f'INSERT INTO legacy_products ({quoted_keys}) VALUES ({placeholders})', [str(row.get(k, '')) for k in all_keys])
+    conn.commit()
+    conn.close()
+
+
+def run_legacy(filename, products, batch):
+    for start in range(0, len(products), batch):
+        legacy_save(filename, products[start:start + batch])
+
+
+def run_batched(journal_mode):
+    def run(filename, products, batch):
+        # The first connect migrates the fresh file and switches it to WAL
+        conn = db.connect(filename)
+        conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+        for start in range(0, len(products), batch):
+            scrapper.insert_products(conn, products[start:start + batch])
+            conn.commit()
+        db.sync_products_fts(conn)
+        conn.commit()
+        conn.close()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, action='append', help='Products to write (repeatable; default 10k and 100k)')
+    parser.add_argument('--batch', type=int, default=scrapper.SAVE_BATCH_SIZE, help='Rows per transaction')
+    args = parser.parse_args()
+    writers = {
+        'legacy': run_legacy,
+        'batched-journal': run_batched('DELETE'),
+        'batched': run_batched('WAL'),
+    }
+    print(f"SQLite {sqlite3.sqlite_version}, {args.batch} rows per transaction")
+    for count in args.rows or [10000, 100000]:
+        products = synthetic_products(count)
+        baseline = None
+        print(f"{count} products")
+        for name, run in writers.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                filename = os.path.join(tmp, 'bench.db')
+                started = time.perf_counter()
+                run(filename, products, args.batch)
+                elapsed = time.perf_counter() - started
+            rate = count / elapsed
+            baseline = baseline or rate
+            print(f"  {name:<16} {elapsed:7.2f} s  {rate:10.0f} rows/s  {rate / baseline:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
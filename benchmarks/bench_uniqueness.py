@@ -0,0 +1,104 @@
+"""Scaling of seo_logic uniqueness scoring from 100 to 100k descriptions.
+
+Scores every description of a synthetic brand corpus against the rest, the
+way /api/seo/keywords does, with:
+
+  original  the pre-index uniqueness_score, re-tokenizing every other
+            description for each one (O(n^2) tokenizations)
+  exact     UniquenessIndex(method='exact'): token sets once, all pairs
+  lsh       UniquenessIndex(method='lsh'): MinHash/LSH candidates, exact
+            Jaccard on candidates only
+
+Quadratic methods stop at their --*-max size. Scores are compared against the
+slowest method that ran at each size. The corpus is clusters of product-line
+templates with random word edits, so every uniqueness bucket is populated.
+
+    python benchmarks/bench_uniqueness.py
+    python benchmarks/bench_uniqueness.py --sizes 100 1000 10000 100000 --original-max 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import seo_logic
+
+VOCABULARY = [
+    'lawn', 'cotton', 'cambric', 'chiffon', 'jacquard', 'khaddar', 'linen', 'silk', 'embroidered', 'printed',
+    'dyed', 'floral', 'geometric', 'paisley', 'kurta', 'shirt', 'trousers', 'dupatta', 'shalwar', 'pants',
+    'neckline', 'sleeves', 'collar', 'hem', 'buttons', 'lace', 'tassels', 'pleats', 'straight', 'flared',
+    'relaxed', 'tailored', 'fit', 'piece', 'unstitched', 'stitched', 'casual', 'formal', 'festive', 'summer',
+    'winter', 'vibrant', 'pastel', 'classic', 'modern', 'traditional', 'elegant', 'soft', 'breathable', 'detailing',
+]
+
+
+def synthetic_corpus(size, seed=0, templates=None, length=40, edit_rate=0.35):
+    """``size`` descriptions drawn from product-line templates with a share of words swapped."""
+    rng = random.Random(seed)
+    vocabulary = VOCABULARY + [f'term{i}' for i in range(2000)]
+    templates = templates or max(10, size // 20)
+    lines = [[rng.choice(vocabulary) for _ in range(length)] for _ in range(templates)]
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(vocabulary) if rng.random() < edit_rate else word for word in rng.choice(lines)]
+        corpus.append(' '.join(words).capitalize() + '.')
+    return corpus
+
+
+def original_uniqueness(description, all_descriptions):
+    desc_tokens = set([w for w in seo_logic.tokenize(description) if w not in seo_logic.stop_words])
+    similarities = []
+    for other in all_descriptions:
+        if other == description:
+            continue
+        other_tokens = set([w for w in seo_logic.tokenize(other) if w not in seo_logic.stop_words])
+        similarities.append(len(desc_tokens & other_tokens) / (len(desc_tokens | other_tokens) + 1e-5))
+    return seo_logic.uniqueness_bucket(max(similarities)) if similarities else 100
+
+
+def run_original(corpus):
+    return [original_uniqueness(description, corpus) for description in corpus]
+
+
+def run_index(method):
+    def run(corpus):
+        seo_logic.content_tokens.cache_clear()  # Time the one-off tokenization too
+        index = seo_logic.UniquenessIndex(corpus, method=method)
+        return [index.score(description) for description in corpus]
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--original-max', type=int, default=300, help='Largest corpus timed with the original scorer')
+    parser.add_argument('--exact-max', type=int, default=2000, help='Largest corpus timed with the exact index')
+    args = parser.parse_args()
+    methods = [('original', run_original, args.original_max), ('exact', run_index('exact'), args.exact_max),
+               ('lsh', run_index('lsh'), None)]
+    for size in args.sizes:
+        corpus = synthetic_corpus(size)
+        print(f"{size} descriptions")
+        reference = None
+        for name, run, limit in methods:
+            if limit is not None and size > limit:
+                print(f"  {name:<9} skipped (> {limit})")
+                continue
+            started = time.perf_counter()
+            scores = run(corpus)
+            elapsed = time.perf_counter() - started
+            if reference is None:
+                reference, reference_name = scores, name
+                agreement = ''
+            else:
+                same = sum(a == b for a, b in zip(scores, reference))
+                agreement = f"  {same / size:7.2%} equal to {reference_name}"
+            buckets = ' '.join(f"{bucket}:{count}" for bucket, count in sorted(Counter(scores).items()))
+            print(f"  {name:<9} {elapsed:9.2f} s  {elapsed / size * 1e6:9.0f} us/description  [{buckets}]{agreement}")
+
+
+if __name__ == "__main__":
+    main()
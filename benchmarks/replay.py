@@ -0,0 +1,310 @@
+"""Record brand pages once, then replay them locally to benchmark the scraper offline.
+
+``record`` runs the normal scrape_brand crawl against the live site and saves
+every page it reads: the rendered DOM of listing and product pages for browser
+brands (scripts stripped, so replay is deterministic) and raw responses for the
+HTTP fast path. ``serve`` replays a fixture directory with one local server per
+recorded host. ``bench`` starts those servers, points the brand config at them
+and runs scrape_brand unchanged, reporting products/sec, p50/p95 page time, CPU
+and peak RSS.
+
+    python benchmarks/replay.py record --brand khaadi --count 40
+    python benchmarks/replay.py serve --brand khaadi
+    python benchmarks/replay.py bench --brand khaadi --brand outfitters --count 40 --latency 50
+
+Peak RSS of the Python process is a process-wide high-water mark, so bench a
+single brand per invocation when comparing memory.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from playwright.async_api import async_playwright
+import scrapper
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SCRIPT_RE = re.compile(r'<script(?![^>]*application/ld\+json)[^>]*>.*?</script>', re.S | re.I)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def origin_of(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class Recorder:
+    """Saves pages seen by scrape_brand into ``fixtures/<brand>/`` keyed by the URL requested."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = {}
+        self.requested = {}
+        os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+
+    def save(self, url, body, content_type, rendered=False):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        # A rendered snapshot beats a raw response recorded for the same URL
+        if not rendered and self.manifest.get(url, {}).get('rendered'):
+            return
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        with open(os.path.join(self.directory, 'bodies', name), 'wb') as f:
+            f.write(body)
+        self.manifest[url] = {'file': name, 'content_type': content_type, 'rendered': rendered}
+
+    async def snapshot(self, page):
+        url = self.requested.get(id(page), page.url)
+        html = SCRIPT_RE.sub('', await page.content())
+        self.save(url, html, 'text/html; charset=utf-8', rendered=True)
+
+    def install(self):
+        self.originals = (scrapper.robust_goto, scrapper.robust_get,
+                          scrapper.read_listing_urls, scrapper.extract_fields_from_product_page)
+        goto, get, read_listing, extract = self.originals
+
+        async def robust_goto(page, url, *args, **kwargs):
+            self.requested[id(page)] = url
+            return await goto(page, url, *args, **kwargs)
+
+        async def robust_get(client, url, *args, **kwargs):
+            response = await get(client, url, *args, **kwargs)
+            if response is not None and response.status_code == 200:
+                self.save(url, response.content, response.headers.get('content-type', 'text/html'))
+            return response
+
+        async def read_listing_urls(page, *args, **kwargs):
+            await self.snapshot(page)
+            return await read_listing(page, *args, **kwargs)
+
+        async def extract_fields_from_product_page(page, *args, **kwargs):
+            await self.snapshot(page)
+            return await extract(page, *args, **kwargs)
+
+        scrapper.robust_goto = robust_goto
+        scrapper.robust_get = robust_get
+        scrapper.read_listing_urls = read_listing_urls
+        scrapper.extract_fields_from_product_page = extract_fields_from_product_page
+
+    def uninstall(self):
+        (scrapper.robust_goto, scrapper.robust_get,
+         scrapper.read_listing_urls, scrapper.extract_fields_from_product_page) = self.originals
+
+    def write_manifest(self):
+        with open(os.path.join(self.directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+
+
+def load_fixture(directory):
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def start_replay_servers(directory, latency_ms=0, port=0):
+    """Serve a fixture directory with one local HTTP server per recorded origin.
+
+    Returns ({original origin: replay origin}, servers). Absolute links to any
+    recorded origin are rewritten in the bodies so the crawl stays local.
+    """
+    manifest = load_fixture(directory)
+    origins = sorted({origin_of(url) for url in manifest})
+    servers = []
+    for i, origin in enumerate(origins):
+        server = ThreadingHTTPServer(('127.0.0.1', port + i if port else 0), None)
+        servers.append((origin, server))
+    mapping = {origin: f"http://127.0.0.1:{server.server_address[1]}" for origin, server in servers}
+
+    def rewrite(body):
+        for original, local in mapping.items():
+            body = body.replace(original.encode(), local.encode())
+            body = body.replace(b'//' + urlparse(original).netloc.encode() + b'/', local.encode() + b'/')
+        return body
+
+    for origin, server in servers:
+        class Handler(BaseHTTPRequestHandler):
+            recorded_origin = origin
+
+            def do_GET(self):
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                entry = manifest.get(self.recorded_origin + self.path)
+                if entry is None:
+                    self.send_error(404)
+                    return
+                with open(os.path.join(directory, 'bodies', entry['file']), 'rb') as f:
+                    body = rewrite(f.read())
+                self.send_response(200)
+                self.send_header('Content-Type', entry['content_type'])
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server.RequestHandlerClass = Handler
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return mapping, [server for _, server in servers]
+
+
+def replay_config(brand_conf, mapping):
+    text = json.dumps(brand_conf)
+    for original, local in mapping.items():
+        text = text.replace(original, local)
+    return json.loads(text)
+
+
+async def run_scrape(brand, config, count, concurrency=None):
+    """scrape_brand with a fresh browser, or no Playwright at all for HTTP fast-path brands."""
+    if scrapper.uses_http_fast_path(config[brand]):
+        return await scrapper.scrape_brand(brand, config, None, max_products=count, concurrency=concurrency, full=True)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=scrapper.BROWSER_ARGS)
+        try:
+            return await scrapper.scrape_brand(brand, config, browser, max_products=count, concurrency=concurrency, full=True)
+        finally:
+            await browser.close()
+
+
+async def record(args, config):
+    for brand in args.brand:
+        directory = os.path.join(args.fixtures, brand)
+        recorder = Recorder(directory)
+        recorder.install()
+        # Record into a scratch database so the real products table and frontier are untouched
+        scrapper.DB_FILE = os.path.join(tempfile.mkdtemp(), 'record.db')
+        try:
+            saved, failed_urls = await run_scrape(brand, config, args.count)
+        finally:
+            recorder.uninstall()
+        recorder.write_manifest()
+        print(f"{brand}: recorded {len(recorder.manifest)} pages ({saved} products, {len(failed_urls)} failed) into {directory}")
+
+
+def serve(args):
+    for brand in args.brand:
+        mapping, _ = start_replay_servers(os.path.join(args.fixtures, brand), args.latency, args.port)
+        print(json.dumps({brand: mapping}), flush=True)
+        args.port = args.port + len(mapping) if args.port else 0
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+async def bench_brand(brand, brand_conf, args):
+    # The replay server runs as a child process so its CPU time stays out of the scraper's numbers
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--brand', brand,
+                               '--fixtures', args.fixtures, '--latency', str(args.latency)],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        mapping = json.loads(server.stdout.readline())[brand]
+        config = {brand: replay_config(brand_conf, mapping)}
+        page_times = []
+        goto, get = scrapper.robust_goto, scrapper.robust_get
+
+        async def timed_goto(page, url, *a, **k):
+            started = time.perf_counter()
+            try:
+                return await goto(page, url, *a, **k)
+            finally:
+                page_times.append((time.perf_counter() - started) * 1000)
+
+        async def timed_get(client, url, *a, **k):
+            started = time.perf_counter()
+            try:
+                return await get(client, url, *a, **k)
+            finally:
+                page_times.append((time.perf_counter() - started) * 1000)
+
+        scrapper.robust_goto, scrapper.robust_get = timed_goto, timed_get
+        scrapper.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        self_before = resource.getrusage(resource.RUSAGE_SELF)
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        started = time.perf_counter()
+        try:
+            saved, failed_urls = await run_scrape(brand, config, args.count, args.concurrency)
+        finally:
+            scrapper.robust_goto, scrapper.robust_get = goto, get
+        elapsed = time.perf_counter() - started
+        # Chromium and the Playwright driver have exited (and been reaped) by now, the replay server has not
+        self_after = resource.getrusage(resource.RUSAGE_SELF)
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    finally:
+        server.terminate()
+        server.wait()
+    cpu_self = (self_after.ru_utime + self_after.ru_stime) - (self_before.ru_utime + self_before.ru_stime)
+    cpu_children = (children_after.ru_utime + children_after.ru_stime) - (children_before.ru_utime + children_before.ru_stime)
+    return {
+        'brand': brand,
+        'products': saved,
+        'failed': len(failed_urls),
+        'seconds': round(elapsed, 2),
+        'products_per_sec': round(saved / elapsed, 2) if elapsed else None,
+        'page_ms_p50': round(percentile(page_times, 50), 1) if page_times else None,
+        'page_ms_p95': round(percentile(page_times, 95), 1) if page_times else None,
+        'page_ms_mean': round(statistics.mean(page_times), 1) if page_times else None,
+        'cpu_python_s': round(cpu_self, 2),
+        'cpu_browser_s': round(cpu_children, 2),
+        'peak_rss_python_mb': round(self_after.ru_maxrss / 1024, 1),
+        'peak_rss_browser_mb': round(children_after.ru_maxrss / 1024, 1),
+    }
+
+
+async def bench(args, config):
+    results = []
+    for brand in args.brand:
+        for run in range(args.runs):
+            result = await bench_brand(brand, config[brand], args)
+            result['run'] = run + 1
+            results.append(result)
+            print(f"{brand} run {run + 1}: {result['products']} products in {result['seconds']}s "
+                  f"({result['products_per_sec']}/s), page p50 {result['page_ms_p50']} ms p95 {result['page_ms_p95']} ms, "
+                  f"CPU {result['cpu_python_s']}s python + {result['cpu_browser_s']}s browser, "
+                  f"peak RSS {result['peak_rss_python_mb']} MB python / {result['peak_rss_browser_mb']} MB largest browser process")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['record', 'serve', 'bench'])
+    parser.add_argument('--brand', action='append', required=True, help='Brand key in scrape_struct.json (repeatable)')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Fixture directory (one subdirectory per brand)')
+    parser.add_argument('--count', type=int, default=40, help='Products to record or scrape per brand')
+    parser.add_argument('--concurrency', type=int, default=None, help='Override product concurrency for bench')
+    parser.add_argument('--latency', type=int, default=0, help='Milliseconds of delay the replay server adds per request')
+    parser.add_argument('--port', type=int, default=0, help='First port for serve (default: ephemeral)')
+    parser.add_argument('--runs', type=int, default=1, help='Bench repetitions per brand')
+    parser.add_argument('--json', help='Write bench results to this JSON file')
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args)
+        return
+    config = scrapper.load_config(os.path.join(ROOT, 'scrape_struct.json'))
+    if args.command == 'record':
+        asyncio.run(record(args, config))
+    else:
+        asyncio.run(bench(args, config))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,684 @@
+"""Declared SQLite schema for products_data.db and its migrations.
+
+The schema version lives in ``PRAGMA user_version``; each entry of MIGRATIONS
+upgrades the database by one version inside a single transaction. Routers and
+the scraper share connections through ``reader()`` (per-thread, read-only) and
+``writer()`` (one serialised connection per file). Run this module directly to
+migrate a database file by hand:
+
+    python db.py [products_data.db] [--rebuild-rollups] [--rebuild-fts]
+"""
+import argparse
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from normalize import normalize_url
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'products_data.db')
+
+# Applied to every connection; WAL itself is persistent and set once per file by connect()
+PRAGMAS = {
+    'synchronous': 'NORMAL',  # WAL stays consistent on power loss; only the last commits may be lost
+    'cache_size': -16000,  # KiB of page cache per connection
+    'temp_store': 'MEMORY',
+}
+BUSY_TIMEOUT = 10  # Seconds a writer waits for another one before "database is locked"
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the file read connections map instead of copying pages
+
+# Price histogram buckets kept in daily_brand_stats: (column, lower bound, upper bound) in PKR
+PRICE_BUCKETS = [
+    ('price_lt_5000', None, 5000),
+    ('price_5000_8000', 5000, 8000),
+    ('price_8000_10000', 8000, 10000),
+    ('price_10000_plus', 10000, None),
+]
+
+# Declared product columns; extra fields from a brand's "spec_fields" are added as TEXT on demand
+PRODUCT_COLUMNS = {
+    'id': 'INTEGER PRIMARY KEY',
+    'brand': 'TEXT NOT NULL',
+    'name': 'TEXT',
+    'price': 'REAL',
+    'description': 'TEXT',
+    'material': 'TEXT',
+    'url': 'TEXT',
+    'scraped_at': 'TEXT',  # ISO-8601 UTC; NULL for rows migrated from before timestamps were recorded
+}
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection that remembers the database file it was opened on."""
+
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        # URI filenames (read-only pool connections) set their path themselves
+        self.path = filename if filename == ':memory:' or str(filename).startswith('file:') else os.path.abspath(filename)
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+# Committed product columns per database file, so steady-state saves skip PRAGMA table_info
+_product_columns = {}
+
+def ensure_product_columns(conn, keys):
+    """Add TEXT columns for product fields outside the declared schema."""
+    known = _product_columns.get(getattr(conn, 'path', None), ())
+    missing = [key for key in keys if key not in known]
+    if not missing:
+        return
+    existing = set(table_columns(conn, 'products'))
+    if hasattr(conn, 'path'):
+        # Only cache columns already on disk; ones added below may still be rolled back with the caller's transaction
+        _product_columns[conn.path] = frozenset(existing)
+    for key in missing:
+        if key not in existing:
+            conn.execute(f'ALTER TABLE products ADD COLUMN "{key}" TEXT')
+
+def migrate_typed_products(conn):
+    """v1: typed products table with indexes, plus the crawl bookkeeping tables.
+
+    Legacy all-TEXT rows are copied across with 'None'/'' turned into NULL and
+    numeric price strings into REAL; their rowids are kept so "latest first"
+    ordering is unchanged.
+    """
+    columns = ', '.join(f'"{name}" {ddl}' for name, ddl in PRODUCT_COLUMNS.items())
+    conn.execute(f'CREATE TABLE products_typed ({columns})')
+    legacy = table_columns(conn, 'products')
+    if legacy:
+        extras = [name for name in legacy if name not in PRODUCT_COLUMNS]
+        for name in extras:
+            conn.execute(f'ALTER TABLE products_typed ADD COLUMN "{name}" TEXT')
+
+        def text(name):
+            return f"NULLIF(NULLIF(\"{name}\", ''), 'None')" if name in legacy else 'NULL'
+
+        price = ("CASE WHEN TRIM(price) GLOB '[0-9]*' AND TRIM(price) NOT GLOB '*[^0-9.]*' "
+                 "THEN CAST(TRIM(price) AS REAL) END") if 'price' in legacy else 'NULL'
+        scraped_at = text('scraped_at') if 'scraped_at' in legacy else text('scraped_date')
+        targets = ['id', 'brand', 'name', 'price', 'description', 'material', 'url', 'scraped_at'] + extras
+        sources = ['rowid', "COALESCE(TRIM(brand), '')", text('name'), price, text('description'),
+                   text('material'), text('url'), scraped_at] + [text(name) for name in extras]
+        quoted = ', '.join(f'"{name}"' for name in targets)
+        conn.execute(f'INSERT INTO products_typed ({quoted}) SELECT {", ".join(sources)} FROM products ORDER BY rowid')
+        conn.execute('DROP TABLE products')
+    conn.execute('ALTER TABLE products_typed RENAME TO products')
+    conn.execute('CREATE INDEX idx_products_brand_scraped_at ON products(brand, scraped_at)')
+    conn.execute('CREATE INDEX idx_products_url ON products(url)')
+    conn.execute('CREATE INDEX idx_products_price ON products(price)')
+    conn.execute('''CREATE TABLE IF NOT EXISTS frontier (
+        url TEXT PRIMARY KEY,
+        brand TEXT,
+        first_seen TEXT,
+        last_seen TEXT,
+        last_changed TEXT,
+        content_hash TEXT,
+        etag TEXT,
+        last_modified TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS scrape_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        brand TEXT,
+        status TEXT,
+        started_at TEXT,
+        updated_at TEXT,
+        finished_at TEXT,
+        saved INTEGER DEFAULT 0,
+        unchanged INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS scrape_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        brand TEXT,
+        count INTEGER,
+        full INTEGER DEFAULT 0,
+        status TEXT,
+        submitted_at TEXT,
+        started_at TEXT,
+        finished_at TEXT,
+        updated_at TEXT,
+        run_id INTEGER,
+        scraped INTEGER DEFAULT 0,
+        unchanged INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0,
+        failed_urls TEXT,
+        last_url TEXT,
+        error TEXT
+    )''')
+
+def migrate_url_upsert(conn):
+    """v2: one current row per product URL, with price changes kept in price_history.
+
+    The price history is seeded from the duplicate rows earlier runs appended
+    (one entry per change, oldest first), then all but the newest row of each
+    URL are dropped and url becomes a unique key for upserts. Triggers append a
+    history row whenever a product's price differs from its last recorded one.
+    """
+    conn.execute('''CREATE TABLE price_history (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL,
+        price REAL NOT NULL,
+        observed_at TEXT
+    )''')
+    conn.execute('''INSERT INTO price_history (url, price, observed_at)
+        SELECT url, price, scraped_at FROM (
+            SELECT id, url, price, scraped_at, LAG(price) OVER (PARTITION BY url ORDER BY id) AS previous
+            FROM products WHERE url IS NOT NULL AND price IS NOT NULL
+        ) WHERE previous IS NULL OR previous != price ORDER BY id''')
+    conn.execute('''DELETE FROM products WHERE url IS NOT NULL
+        AND id NOT IN (SELECT MAX(id) FROM products WHERE url IS NOT NULL GROUP BY url)''')
+    conn.execute('DROP INDEX idx_products_url')
+    conn.execute('CREATE UNIQUE INDEX idx_products_url ON products(url)')
+    conn.execute('CREATE INDEX idx_price_history_url ON price_history(url, id)')
+    for event in ('INSERT', 'UPDATE OF price'):
+        name = 'insert' if event == 'INSERT' else 'update'
+        conn.execute(f'''CREATE TRIGGER products_price_history_{name} AFTER {event} ON products
+            WHEN NEW.url IS NOT NULL AND NEW.price IS NOT NULL AND NEW.price IS NOT
+                (SELECT price FROM price_history WHERE url = NEW.url ORDER BY id DESC LIMIT 1)
+            BEGIN
+                INSERT INTO price_history (url, price, observed_at) VALUES (NEW.url, NEW.price, NEW.scraped_at);
+            END''')
+
+def bucket_condition(price, low, high):
+    bounds = [f'{price} >= {low}' if low is not None else None, f'{price} < {high}' if high is not None else None]
+    return f"({price} IS NOT NULL AND {' AND '.join(b for b in bounds if b)})"
+
+def rollup_day(scraped_at):
+    # Rows without a timestamp (migrated from before scraped_at existed) roll up under day ''
+    return f"COALESCE(date({scraped_at}), '')"
+
+def rollup_add_sql(row):
+    """Count ``row`` (NEW/OLD) into its brand/day rollup."""
+    buckets = [name for name, _, _ in PRICE_BUCKETS]
+    conditions = [bucket_condition(f'{row}.price', low, high) for _, low, high in PRICE_BUCKETS]
+    return f'''INSERT INTO daily_brand_stats (brand, day, products, priced, price_sum, min_price, max_price, {', '.join(buckets)})
+            VALUES ({row}.brand, {rollup_day(f'{row}.scraped_at')}, 1, {row}.price IS NOT NULL, COALESCE({row}.price, 0),
+                    {row}.price, {row}.price, {', '.join(conditions)})
+            ON CONFLICT(brand, day) DO UPDATE SET
+                products = products + 1,
+                priced = priced + excluded.priced,
+                price_sum = price_sum + excluded.price_sum,
+                min_price = COALESCE(MIN(min_price, excluded.min_price), min_price, excluded.min_price),
+                max_price = COALESCE(MAX(max_price, excluded.max_price), max_price, excluded.max_price),
+                {', '.join(f'{name} = {name} + excluded.{name}' for name in buckets)};'''
+
+def rollup_remove_sql(row):
+    """Take ``row`` (OLD) out of its brand/day rollup.
+
+    min/max cannot be decremented, so they are re-read from products (an index
+    range on brand, scraped_at) only when the removed price was the extreme.
+    """
+    day = rollup_day(f'{row}.scraped_at')
+    in_day = (f"(({day} = '' AND scraped_at IS NULL) OR "
+              f"(scraped_at >= {day} AND scraped_at < date({day}, '+1 day')))")
+    decrements = ', '.join(f'{name} = {name} - {bucket_condition(f"{row}.price", low, high)}'
+                           for name, low, high in PRICE_BUCKETS)
+    key = f'brand = {row}.brand AND day = {day}'
+    return f'''UPDATE daily_brand_stats SET
+                products = products - 1,
+                priced = priced - ({row}.price IS NOT NULL),
+                price_sum = price_sum - COALESCE({row}.price, 0),
+                {decrements}
+            WHERE {key};
+            UPDATE daily_brand_stats SET
+                min_price = (SELECT MIN(price) FROM products WHERE brand = {row}.brand AND {in_day}),
+                max_price = (SELECT MAX(price) FROM products WHERE brand = {row}.brand AND {in_day})
+            WHERE {key} AND ({row}.price <= min_price OR {row}.price >= max_price);
+            DELETE FROM daily_brand_stats WHERE {key} AND products <= 0;'''
+
+def fill_rollups(conn, source, day):
+    """Replace daily_brand_stats with the per brand/``day`` aggregates of ``source``."""
+    buckets = [name for name, _, _ in PRICE_BUCKETS]
+    sums = [f'SUM({bucket_condition("price", low, high)})' for _, low, high in PRICE_BUCKETS]
+    conn.execute('DELETE FROM daily_brand_stats')
+    conn.execute(f'''INSERT INTO daily_brand_stats (brand, day, products, priced, price_sum, min_price, max_price, {', '.join(buckets)})
+        SELECT brand, {day}, COUNT(*), COUNT(price), COALESCE(SUM(price), 0), MIN(price), MAX(price), {', '.join(sums)}
+        FROM {source} GROUP BY brand, {day}''')
+
+def rebuild_rollups(conn):
+    """Recompute daily_brand_stats from product_observations; record_observations keeps it current afterwards."""
+    fill_rollups(conn, 'product_observations', 'day')
+
+def migrate_daily_rollups(conn):
+    """v3: daily_brand_stats, per brand and scrape day, maintained by triggers on products."""
+    conn.execute(f'''CREATE TABLE daily_brand_stats (
+        brand TEXT NOT NULL,
+        day TEXT NOT NULL,
+        products INTEGER NOT NULL DEFAULT 0,
+        priced INTEGER NOT NULL DEFAULT 0,
+        price_sum REAL NOT NULL DEFAULT 0,
+        min_price REAL,
+        max_price REAL,
+        {', '.join(f'{name} INTEGER NOT NULL DEFAULT 0' for name, _, _ in PRICE_BUCKETS)},
+        PRIMARY KEY (brand, day)
+    ) WITHOUT ROWID''')
+    conn.execute(f'''CREATE TRIGGER products_rollup_insert AFTER INSERT ON products BEGIN
+            {rollup_add_sql('NEW')}
+        END''')
+    conn.execute(f'''CREATE TRIGGER products_rollup_delete AFTER DELETE ON products BEGIN
+            {rollup_remove_sql('OLD')}
+        END''')
+    conn.execute(f'''CREATE TRIGGER products_rollup_update AFTER UPDATE OF brand, price, scraped_at ON products BEGIN
+            {rollup_remove_sql('OLD')}
+            {rollup_add_sql('NEW')}
+        END''')
+    fill_rollups(conn, 'products', rollup_day('scraped_at'))
+
+# Text columns indexed by products_fts. bm25() takes one weight per column in this order; product search
+# weighs name 10, description 1 and material 3
+FTS_COLUMNS = ['name', 'description', 'material']
+
+def migrate_products_fts(conn):
+    """v4: products_fts, an external-content FTS5 index over product text kept in sync by triggers."""
+    columns = ', '.join(FTS_COLUMNS)
+    old_values = ', '.join(f'OLD.{name}' for name in FTS_COLUMNS)
+    new_values = ', '.join(f'NEW.{name}' for name in FTS_COLUMNS)
+    changed = ' OR '.join(f'OLD.{name} IS NOT NEW.{name}' for name in FTS_COLUMNS)
+    conn.execute(f'''CREATE VIRTUAL TABLE products_fts USING fts5(
+        {columns}, content='products', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )''')
+    conn.execute(f'''CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END''')
+    conn.execute(f'''CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+        END''')
+    # Upserts rewrite every column; only reindex rows whose text actually changed
+    conn.execute(f'''CREATE TRIGGER products_fts_update AFTER UPDATE OF {columns} ON products WHEN {changed} BEGIN
+            INSERT INTO products_fts (products_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO products_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END''')
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+def migrate_normalized_urls(conn):
+    """v5: key products, price_history and frontier by normalize_url(url).
+
+    v2 deduplicated on the raw URL, so a product reached through two listings
+    (different tracking parameters) kept two rows and split its price
+    history. The newest row of each normalized URL survives, the histories
+    are merged with repeated prices dropped, and each frontier URL keeps its
+    most recently seen entry.
+    """
+    conn.create_function('normalize_url', 1, normalize_url, deterministic=True)
+    conn.execute('''DELETE FROM products WHERE url IS NOT NULL
+        AND id NOT IN (SELECT MAX(id) FROM products WHERE url IS NOT NULL GROUP BY normalize_url(url))''')
+    conn.execute('UPDATE products SET url = normalize_url(url) WHERE url IS NOT NULL AND url != normalize_url(url)')
+    conn.execute('UPDATE price_history SET url = normalize_url(url) WHERE url != normalize_url(url)')
+    conn.execute('''DELETE FROM price_history WHERE id IN (
+        SELECT id FROM (SELECT id, price, LAG(price) OVER (PARTITION BY url ORDER BY id) AS previous FROM price_history)
+        WHERE previous = price)''')
+    conn.execute('''DELETE FROM frontier WHERE rowid NOT IN (
+        SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER (
+            PARTITION BY normalize_url(url) ORDER BY last_seen DESC, rowid DESC) AS rank FROM frontier)
+        WHERE rank = 1)''')
+    conn.execute('UPDATE frontier SET url = normalize_url(url) WHERE url != normalize_url(url)')
+
+def migrate_deferred_fts(conn):
+    """v6: index new products in products_fts in bulk (sync_products_fts) instead of row by row.
+
+    The per-row insert trigger made FTS5 maintenance the largest cost of a
+    product save. fts_state.indexed_id is the highest products.id already
+    indexed; rows above it are picked up by the next sync, and the update and
+    delete triggers only touch rows at or below it. Deleting the newest rows
+    lowers the mark, so a reused id is never mistaken for an indexed one.
+    """
+    columns = ', '.join(FTS_COLUMNS)
+    old_values = ', '.join(f'OLD.{name}' for name in FTS_COLUMNS)
+    new_values = ', '.join(f'NEW.{name}' for name in FTS_COLUMNS)
+    changed = ' OR '.join(f'OLD.{name} IS NOT NEW.{name}' for name in FTS_COLUMNS)
+    indexed = 'OLD.id <= (SELECT indexed_id FROM fts_state)'
+    conn.execute('CREATE TABLE fts_state (id INTEGER PRIMARY KEY CHECK (id = 1), indexed_id INTEGER NOT NULL)')
+    conn.execute('INSERT INTO fts_state (id, indexed_id) SELECT 1, COALESCE(MAX(id), 0) FROM products')
+    for name in ('insert', 'delete', 'update'):
+        conn.execute(f'DROP TRIGGER products_fts_{name}')
+    conn.execute(f'''CREATE TRIGGER products_fts_delete AFTER DELETE ON products WHEN {indexed} BEGIN
+            INSERT INTO products_fts (products_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+            UPDATE fts_state SET indexed_id = (SELECT COALESCE(MAX(id), 0) FROM products)
+            WHERE indexed_id > (SELECT COALESCE(MAX(id), 0) FROM products);
+        END''')
+    conn.execute(f'''CREATE TRIGGER products_fts_update AFTER UPDATE OF {columns} ON products
+        WHEN {indexed} AND ({changed}) BEGIN
+            INSERT INTO products_fts (products_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO products_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END''')
+
+def sync_products_fts(conn):
+    """Index the products added since the last sync; returns how many. Run inside a write transaction."""
+    columns = ', '.join(FTS_COLUMNS)
+    indexed_id = conn.execute('SELECT indexed_id FROM fts_state').fetchone()[0]
+    cursor = conn.execute(f'INSERT INTO products_fts (rowid, {columns}) SELECT id, {columns} FROM products WHERE id > ?',
+                          (indexed_id,))
+    conn.execute('UPDATE fts_state SET indexed_id = (SELECT COALESCE(MAX(id), 0) FROM products)')
+    return cursor.rowcount
+
+def rebuild_fts(conn):
+    """Reindex every product from scratch."""
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    conn.execute('UPDATE fts_state SET indexed_id = (SELECT COALESCE(MAX(id), 0) FROM products)')
+
+def migrate_observed_rollups(conn):
+    """v7: feed daily_brand_stats from product_observations instead of the current products rows.
+
+    The v3 triggers counted each product under its latest scraped_at, so a
+    rescrape moved it out of the day it was counted in and the trends only
+    showed when products were last written. product_observations holds one
+    row per product and day it was scraped or seen unchanged (the last price
+    seen that day wins); rows for earlier days are never touched again, and
+    record_observations folds new ones into the rollups. The history is
+    seeded from price_history, the products rows and the frontier's last_seen.
+    """
+    conn.execute('''CREATE TABLE product_observations (
+        url TEXT NOT NULL,
+        day TEXT NOT NULL,
+        brand TEXT NOT NULL,
+        price REAL,
+        PRIMARY KEY (url, day)
+    ) WITHOUT ROWID''')
+    conn.execute('CREATE INDEX idx_product_observations_brand_day ON product_observations(brand, day, price)')
+    # Per-brand catalogue stats no longer come from the rollups; this keeps them an index-only scan
+    conn.execute('CREATE INDEX idx_products_brand_price ON products(brand, price)')
+    conn.execute(f'''INSERT INTO product_observations (url, day, brand, price)
+        SELECT h.url, {rollup_day('h.observed_at')}, p.brand, h.price FROM price_history h JOIN products p ON p.url = h.url
+        WHERE true ORDER BY h.id ON CONFLICT(url, day) DO UPDATE SET price = excluded.price''')
+    conn.execute(f'''INSERT INTO product_observations (url, day, brand, price)
+        SELECT url, {rollup_day('scraped_at')}, brand, price FROM products WHERE url IS NOT NULL
+        ON CONFLICT(url, day) DO UPDATE SET price = excluded.price''')
+    conn.execute(f'''INSERT INTO product_observations (url, day, brand, price)
+        SELECT f.url, date(f.last_seen), p.brand, p.price FROM frontier f JOIN products p ON p.url = f.url
+        WHERE f.last_seen IS NOT NULL ON CONFLICT(url, day) DO UPDATE SET price = excluded.price''')
+    for name in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER products_rollup_{name}')
+    rebuild_rollups(conn)
+
+@functools.lru_cache(maxsize=1)
+def rollup_delta_sql():
+    """Folds the changed rows of temp.observed into daily_brand_stats."""
+    buckets = [name for name, _, _ in PRICE_BUCKETS]
+    deltas = [f'SUM({bucket_condition("price", low, high)}) - SUM({bucket_condition("old_price", low, high)})'
+              for _, low, high in PRICE_BUCKETS]
+    return f'''INSERT INTO daily_brand_stats (brand, day, products, priced, price_sum, min_price, max_price, {', '.join(buckets)})
+        SELECT brand, day, SUM(NOT seen), COUNT(price) - COUNT(old_price), COALESCE(SUM(price), 0) - COALESCE(SUM(old_price), 0),
+               MIN(price), MAX(price), {', '.join(deltas)}
+        FROM temp.observed WHERE NOT seen OR price IS NOT old_price GROUP BY brand, day
+        ON CONFLICT(brand, day) DO UPDATE SET
+            products = products + excluded.products,
+            priced = priced + excluded.priced,
+            price_sum = price_sum + excluded.price_sum,
+            min_price = COALESCE(MIN(min_price, excluded.min_price), min_price, excluded.min_price),
+            max_price = COALESCE(MAX(max_price, excluded.max_price), max_price, excluded.max_price),
+            {', '.join(f'{name} = {name} + excluded.{name}' for name in buckets)}'''
+
+def record_observations(conn, urls, observed_at, price_history=False):
+    """Record that the stored products at ``urls`` were seen at ``observed_at`` and update daily_brand_stats.
+
+    Call it after writing the products, inside the same transaction. A product
+    seen again on the same day only moves the rollup if its price changed. With
+    ``price_history`` (insert_products), products whose price differs from
+    their last recorded one also get a price_history row.
+    """
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS observed_urls (url TEXT PRIMARY KEY) WITHOUT ROWID')
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS observed (
+        url TEXT PRIMARY KEY, brand TEXT, day TEXT, price REAL, seen INTEGER, old_price REAL) WITHOUT ROWID''')
+    conn.execute('DELETE FROM temp.observed_urls')
+    conn.execute('DELETE FROM temp.observed')
+    conn.executemany('INSERT OR IGNORE INTO temp.observed_urls (url) VALUES (?)', ((url,) for url in urls))
+    day = rollup_day('?')
+    conn.execute(f'''INSERT INTO temp.observed (url, brand, day, price, seen, old_price)
+        SELECT p.url, p.brand, {day}, p.price, o.url IS NOT NULL, o.price FROM temp.observed_urls u
+        JOIN products p ON p.url = u.url LEFT JOIN product_observations o ON o.day = {day} AND o.url = p.url''',
+        (observed_at, observed_at))
+    if price_history:
+        conn.execute('''INSERT INTO price_history (url, price, observed_at)
+            SELECT url, price, ? FROM temp.observed WHERE price IS NOT NULL AND price IS NOT
+                (SELECT h.price FROM price_history h WHERE h.url = observed.url ORDER BY h.id DESC LIMIT 1)''',
+            (observed_at,))
+    conn.execute('''INSERT INTO product_observations (url, day, brand, price)
+        SELECT url, day, brand, price FROM temp.observed WHERE NOT seen OR price IS NOT old_price
+        ON CONFLICT(day, url) DO UPDATE SET price = excluded.price''')
+    conn.execute(rollup_delta_sql())
+    # A same-day price change may have replaced the day's extreme; min/max cannot be decremented
+    conn.execute('''UPDATE daily_brand_stats SET
+            min_price = (SELECT MIN(price) FROM product_observations o
+                         WHERE o.day = daily_brand_stats.day AND o.brand = daily_brand_stats.brand),
+            max_price = (SELECT MAX(price) FROM product_observations o
+                         WHERE o.day = daily_brand_stats.day AND o.brand = daily_brand_stats.brand)
+        WHERE (brand, day) IN (SELECT brand, day FROM temp.observed WHERE seen AND old_price IS NOT NULL AND price IS NOT old_price)''')
+
+def migrate_batched_writes(conn):
+    """v8: cut the per-row work and the pages each product checkpoint writes.
+
+    The v2 triggers ran a price_history lookup and insert for every upserted
+    row; record_observations now appends the history per batch. Indexes
+    ordered by price scattered every batch across their leaves, so a 20-row
+    checkpoint wrote ~60 pages: idx_products_brand_price and the
+    (brand, day, price) index of product_observations go, and observations
+    are keyed by (day, url) so a day's rollup is still a range scan.
+    idx_products_brand_scraped_at and idx_products_price had no readers left.
+    """
+    for name in ('insert', 'update'):
+        conn.execute(f'DROP TRIGGER products_price_history_{name}')
+    for name in ('idx_products_brand_scraped_at', 'idx_products_price', 'idx_products_brand_price'):
+        conn.execute(f'DROP INDEX {name}')
+    conn.execute('''CREATE TABLE product_observations_by_day (
+        day TEXT NOT NULL,
+        url TEXT NOT NULL,
+        brand TEXT NOT NULL,
+        price REAL,
+        PRIMARY KEY (day, url)
+    ) WITHOUT ROWID''')
+    conn.execute('''INSERT INTO product_observations_by_day (day, url, brand, price)
+        SELECT day, url, brand, price FROM product_observations''')
+    conn.execute('DROP TABLE product_observations')
+    conn.execute('ALTER TABLE product_observations_by_day RENAME TO product_observations')
+
+def migrate_job_owners(conn):
+    """v9: scrape_jobs.owner, the host:pid of the process whose worker runs the job."""
+    conn.execute('ALTER TABLE scrape_jobs ADD COLUMN owner TEXT')
+
+MIGRATIONS = [
+    migrate_typed_products,
+    migrate_url_upsert,
+    migrate_daily_rollups,
+    migrate_products_fts,
+    migrate_normalized_urls,
+    migrate_deferred_fts,
+    migrate_observed_rollups,
+    migrate_batched_writes,
+    migrate_job_owners,
+]
+
+def migrate(conn):
+    """Apply every pending migration; each one commits together with its user_version bump."""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the write lock
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= target:
+                conn.rollback()
+                continue
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Migrated database to schema version {target} ({migration.__name__})")
+    return conn
+
+_migrated = set()
+
+def connect(filename=DB_FILE, check_same_thread=True):
+    """Open ``filename`` with the tuned pragmas, switching it to WAL and migrating it
+    on the first connection of this process."""
+    conn = sqlite3.connect(filename, timeout=BUSY_TIMEOUT, factory=Connection,
+                           cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=check_same_thread)
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    if conn.path not in _migrated:
+        # WAL lets the API read while the scraper writes
+        conn.execute('PRAGMA journal_mode = WAL')
+        migrate(conn)
+        _migrated.add(conn.path)
+    return conn
+
+def init_db(filename=DB_FILE):
+    conn = connect(filename)
+    try:
+        # Catch up on products a crashed scrape saved without reaching its final FTS sync
+        with conn:
+            synced = sync_products_fts(conn)
+        if synced:
+            logger.info(f"Indexed {synced} products missing from products_fts")
+    finally:
+        conn.close()
+
+class ConnectionPool:
+    """Long-lived connections to one database file.
+
+    Every thread gets its own read-only connection (mmap'd, tuned cache) the
+    first time it calls ``reader``, and keeps it for later requests. Writes go
+    through a single shared connection behind a lock, committed when the
+    ``writer`` block exits cleanly and rolled back otherwise. With WAL, readers
+    never wait on the writer and the writer never waits on readers.
+    """
+
+    def __init__(self, filename=DB_FILE):
+        self.filename = os.path.abspath(filename)
+        self._local = threading.local()
+        self._readers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self.reader_opens = 0
+        self.reader_checkouts = 0
+        self.writer_checkouts = 0
+        self.writer_wait = 0.0
+        self.writer_max_wait = 0.0
+
+    def _open_reader(self):
+        if self.filename not in _migrated:
+            init_db(self.filename)
+        conn = sqlite3.connect(f'file:{self.filename}?mode=ro', uri=True, timeout=BUSY_TIMEOUT, factory=Connection,
+                               cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        conn.path = self.filename
+        for name, value in PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        with self._lock:
+            self.reader_opens += 1
+            self._readers.add(conn)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open_reader()
+        conn.row_factory = None
+        with self._lock:
+            self.reader_checkouts += 1
+        try:
+            yield conn
+        finally:
+            # Never hold a read snapshot between requests, or the WAL cannot be checkpointed
+            if conn.in_transaction:
+                conn.rollback()
+
+    @contextmanager
+    def writer(self):
+        started = time.perf_counter()
+        with self._writer_lock:
+            waited = time.perf_counter() - started
+            if self._writer is None:
+                self._writer = connect(self.filename, check_same_thread=False)
+            conn = self._writer
+            conn.row_factory = None
+            self.writer_checkouts += 1
+            self.writer_wait += waited
+            self.writer_max_wait = max(self.writer_max_wait, waited)
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                'filename': self.filename,
+                'readers_open': len(self._readers),
+                'reader_opens': self.reader_opens,
+                'reader_checkouts': self.reader_checkouts,
+                'writer_open': self._writer is not None,
+                'writer_checkouts': self.writer_checkouts,
+                'writer_wait_ms': round(self.writer_wait * 1000, 1),
+                'writer_max_wait_ms': round(self.writer_max_wait * 1000, 1),
+            }
+
+    def close(self):
+        with self._lock:
+            readers = list(self._readers)
+            self._readers = weakref.WeakSet()
+        for conn in readers:
+            conn.close()
+        self._local = threading.local()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(filename=DB_FILE):
+    path = os.path.abspath(filename)
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
+
+def reader(filename=DB_FILE):
+    """``with db.reader() as conn:`` -- this thread's read-only connection to ``filename``."""
+    return get_pool(filename).reader()
+
+def writer(filename=DB_FILE):
+    """``with db.writer() as conn:`` -- the shared write connection, committed on exit."""
+    return get_pool(filename).writer()
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Migrate products_data.db to the current schema.")
+    parser.add_argument('filename', nargs='?', default=DB_FILE)
+    parser.add_argument('--rebuild-rollups', action='store_true', help='Recompute daily_brand_stats from product_observations')
+    parser.add_argument('--rebuild-fts', action='store_true', help='Rebuild the products_fts full-text index')
+    args = parser.parse_args()
+    init_db(args.filename)
+    if args.rebuild_rollups:
+        with writer(args.filename) as conn:
+            rebuild_rollups(conn)
+        logger.info(f"Rebuilt daily_brand_stats in {args.filename}")
+    if args.rebuild_fts:
+        with writer(args.filename) as conn:
+            rebuild_fts(conn)
+        logger.info(f"Rebuilt products_fts in {args.filename}")
@@ -0,0 +1,198 @@
+"""Columnar export of the product store for notebooks and the DuckDB engine.
+
+Writes three Parquet datasets under EXPORT_DIR, hive-partitioned by
+``brand_key`` (the normalized brand name) and ``day`` (UTC date of the scrape
+or price observation):
+
+    products/       current state of every product
+    price_history/  every recorded price change, with the product's brand
+    seo_scores/     per-product seo_logic scores against seo_keywords.json
+
+Each dataset is written to a scratch directory and swapped in whole, so
+readers never see a half-written export and products that moved to a newer
+scrape day do not linger in their old partition. An empty dataset leaves the
+previous export of it in place. ``manifest.json`` records the row counts and
+export time.
+
+    python export.py
+    python export.py --out /data/bazaarintel --skip-seo
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+
+import db
+from normalize import normalize_brand_name
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = ds = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv('ANALYTICS_EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'))
+KEYWORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seo_keywords.json')
+EXPORT_BATCH_SIZE = 50000  # Rows per Arrow record batch read from SQLite
+SEO_SCORE_FIELDS = ['keyword_density', 'content_quality', 'brand_consistency', 'uniqueness', 'readability']
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+def partition_values(brand, timestamp):
+    return normalize_brand_name(brand or ''), timestamp[:10] if timestamp else None
+
+def product_schema(columns):
+    types = {'id': pa.int64(), 'price': pa.float64()}
+    fields = [pa.field(name, types.get(name, pa.string())) for name in columns]
+    return pa.schema(fields + [pa.field('brand_key', pa.string()), pa.field('day', pa.string())])
+
+def sqlite_batches(conn, sql, schema, row_to_values, batch_size=EXPORT_BATCH_SIZE):
+    """Stream a query as Arrow record batches; ``row_to_values`` maps one row to the schema's columns."""
+    cursor = conn.execute(sql)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        columns = list(zip(*(row_to_values(row) for row in rows)))
+        yield pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                         schema=schema)
+
+def write_dataset(batches, schema, out_dir, name):
+    """Write ``batches`` as ``out_dir/name`` partitioned by brand_key/day, replacing any previous export.
+
+    The previous export is renamed aside before the new one is renamed into
+    place and only deleted afterwards; if a crash lands between the two
+    renames, the next export restores it first.
+    """
+    final_dir = os.path.join(out_dir, name)
+    scratch_dir = os.path.join(out_dir, f'.{name}.tmp')
+    old_dir = os.path.join(out_dir, f'.{name}.old')
+    if not os.path.isdir(final_dir) and os.path.isdir(old_dir):
+        os.replace(old_dir, final_dir)
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in batches:
+            rows += batch.num_rows
+            yield batch
+
+    partitioning = ds.partitioning(pa.schema([pa.field('brand_key', pa.string()), pa.field('day', pa.string())]),
+                                   flavor='hive')
+    ds.write_dataset(counted(), scratch_dir, schema=schema, format='parquet', partitioning=partitioning,
+                     basename_template='part-{i}.parquet', existing_data_behavior='overwrite_or_ignore')
+    if not rows:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        logger.warning(f"No rows for {name}; kept the previous export in {final_dir}")
+        return rows
+    if os.path.isdir(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(scratch_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"Exported {rows} rows to {final_dir}")
+    return rows
+
+def export_products(conn, out_dir):
+    columns = db.table_columns(conn, 'products')
+    schema = product_schema(columns)
+    brand_index, scraped_index = columns.index('brand'), columns.index('scraped_at')
+    quoted = ', '.join(f'"{name}"' for name in columns)
+    return write_dataset(
+        sqlite_batches(conn, f'SELECT {quoted} FROM products ORDER BY id', schema,
+                       lambda row: row + partition_values(row[brand_index], row[scraped_index])),
+        schema, out_dir, 'products')
+
+def export_price_history(conn, out_dir):
+    schema = pa.schema([
+        pa.field('url', pa.string()), pa.field('brand', pa.string()), pa.field('price', pa.float64()),
+        pa.field('observed_at', pa.string()), pa.field('brand_key', pa.string()), pa.field('day', pa.string()),
+    ])
+    return write_dataset(
+        sqlite_batches(conn, '''SELECT h.url, p.brand, h.price, h.observed_at
+            FROM price_history h LEFT JOIN products p ON p.url = h.url ORDER BY h.id''', schema,
+                       lambda row: row + partition_values(row[1], row[3])),
+        schema, out_dir, 'price_history')
+
+def export_seo_scores(conn, out_dir, keywords_file=KEYWORDS_FILE, density_mode=None):
+    """Score every product description the way /api/seo/keywords does, one row per product."""
+    import seo_logic  # Pulls in NLTK data; only needed for this dataset
+    try:
+        with open(keywords_file, encoding='utf-8') as f:
+            keyword_map = {k.strip().title(): v for k, v in json.load(f).items()}
+    except (OSError, ValueError):
+        logger.warning(f"No keyword map in {keywords_file}; keyword density will score 0")
+        keyword_map = {}
+    rows = conn.execute("""SELECT id, url, brand, scraped_at, description FROM products
+        WHERE description IS NOT NULL AND description != '' ORDER BY id""").fetchall()
+    brand_descs = {}
+    for row in rows:
+        brand_descs.setdefault(row[2].strip().title(), []).append(row[4])
+    # Descriptions are scored per brand in one batch; identical descriptions share their scores
+    brand_scores = {brand: dict(zip(descs, seo_logic.seo_scores_batch(descs, brand, keyword_map, density_mode=density_mode)))
+                    for brand, descs in brand_descs.items()}
+    schema = pa.schema([pa.field('id', pa.int64()), pa.field('url', pa.string()), pa.field('brand', pa.string()),
+                        pa.field('scraped_at', pa.string())]
+                       + [pa.field(name, pa.int64()) for name in SEO_SCORE_FIELDS]
+                       + [pa.field('brand_key', pa.string()), pa.field('day', pa.string())])
+
+    def batches():
+        for start in range(0, len(rows), EXPORT_BATCH_SIZE):
+            values = []
+            for product_id, url, brand, scraped_at, description in rows[start:start + EXPORT_BATCH_SIZE]:
+                brand = brand.strip().title()
+                scores = brand_scores[brand][description]
+                values.append((product_id, url, brand, scraped_at, *(scores[name] for name in SEO_SCORE_FIELDS),
+                               *partition_values(brand, scraped_at)))
+            columns = list(zip(*values))
+            yield pa.RecordBatch.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                                             schema=schema)
+
+    return write_dataset(batches(), schema, out_dir, 'seo_scores')
+
+def source_mtime(filename):
+    """Latest modification time of a SQLite database and its WAL; any committed write moves it forward."""
+    return max((os.path.getmtime(path) for path in (filename, filename + '-wal') if os.path.exists(path)), default=0.0)
+
+def export_all(out_dir=EXPORT_DIR, filename=db.DB_FILE, seo=True, density_mode=None):
+    """Export every dataset and write ``manifest.json``; returns the manifest."""
+    require_pyarrow()
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+    with db.reader(filename) as conn:
+        # Taken once the connection is open (opening the first one may checkpoint the WAL) but before the
+        # snapshot, so a write racing the export makes it look stale rather than fresh
+        mtime = source_mtime(filename)
+        # One read transaction, so every dataset comes from the same snapshot
+        conn.execute('BEGIN')
+        counts['products'] = export_products(conn, out_dir)
+        counts['price_history'] = export_price_history(conn, out_dir)
+        if seo:
+            import seo_logic
+            density_mode = density_mode or seo_logic.DENSITY_MODE
+            counts['seo_scores'] = export_seo_scores(conn, out_dir, density_mode=density_mode)
+    manifest = {'exported_at': datetime.utcnow().isoformat() + 'Z', 'source': os.path.abspath(filename),
+                'source_mtime': mtime, 'rows': counts}
+    if seo:
+        manifest['seo_density_mode'] = density_mode
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export products, price history and SEO scores to partitioned Parquet.")
+    parser.add_argument('--out', default=EXPORT_DIR, help='Export directory')
+    parser.add_argument('--db', default=db.DB_FILE, help='SQLite database to export')
+    parser.add_argument('--skip-seo', action='store_true', help='Do not compute per-product SEO scores')
+    parser.add_argument('--density-mode', choices=['legacy', 'phrase'], help='Keyword density mode (default SEO_DENSITY_MODE)')
+    args = parser.parse_args()
+    manifest = export_all(args.out, args.db, seo=not args.skip_seo, density_mode=args.density_mode)
+    logger.info(f"Export finished: {manifest['rows']}")
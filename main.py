@@ -4,19 +4,34 @@ import os
 # Load environment variables from .env file
 load_dotenv()
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from routers import trends, scrape, seo, report as report_router
+from routers import trends, scrape, seo, products, report as report_router
 from routers.agent import router as agent_router
 from fastapi.responses import HTMLResponse
+import analytics
+import db
+import scrape_worker
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Bring products_data.db up to the current schema before serving requests
+    db.init_db()
+    yield
+    # Close the warm browser kept by the scrape worker, then the pooled database connections
+    scrape_worker.shutdown()
+    analytics.close()
+    db.close_pools()
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
 app.include_router(trends.router)
 app.include_router(scrape.router)
 app.include_router(seo.router)
+app.include_router(products.router)
 app.include_router(agent_router)
 app.include_router(report_router.router)
 
@@ -0,0 +1,36 @@
+"""Normalization helpers shared by the scraper, the database layer and the export.
+
+Kept free of heavy imports so export.py and db.py can use them without
+pulling in Playwright.
+"""
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only say how a visitor reached a page (Khaadi's listing
+# links carry ?source=plp&plpcgid=..., Shopify search results _pos/_sid/_ss).
+# Everything else, e.g. Shopify's ?variant=, identifies the product and is kept.
+TRACKING_PARAMS = {
+    'source', 'plpcgid', 'ref', 'gclid', 'fbclid', 'msclkid', 'srsltid', 'mc_cid', 'mc_eid',
+    '_pos', '_sid', '_ss', '_psq', '_v',
+}
+TRACKING_PREFIXES = ('utm_',)
+
+def normalize_brand_name(brand_name):
+    return brand_name.strip().lower().replace(' ', '_')
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def normalize_url(url):
+    """Canonical form of a product URL: lowercase scheme and host, no fragment, no tracking parameters.
+
+    The remaining query parameters keep their order. Values that are not
+    http(s) URLs are returned unchanged.
+    """
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    if parts.scheme.lower() not in ('http', 'https') or not parts.netloc:
+        return url
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not is_tracking_param(k)]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import os
-import sqlite3
 import re
 import json
 import re
@@ -10,6 +10,8 @@ from langchain.chat_models import init_chat_model
 
 # --- AGENTIC WORKFLOW IMPORT ---
 from agent.agent_graph import run_agent
+import analytics
+import db
 
 load_dotenv()
 
@@ -18,21 +20,20 @@ router = APIRouter()
 groq_api_key = os.getenv("GROQ_API_KEY")
 llm = init_chat_model("meta-llama/llama-4-maverick-17b-128e-instruct", model_provider="groq")
 
-DB_PATH = "products_data.db"
-
 STRICT_SQL_PROMPT = (
     "ONLY output a valid SQLite SQL query for this question. "
     "Do NOT explain, do NOT show your reasoning, do NOT output anything except the SQL query. "
-    "The table is called 'products'."
+    "The table is called 'products'. "
+    "To find products by words in their name, description or material, do NOT use LIKE '%...%'; use the "
+    "full-text index products_fts (columns name, description, material; rowid = products.id), e.g. "
+    "SELECT p.name, p.brand, p.price FROM products p JOIN products_fts ON products_fts.rowid = p.id "
+    "WHERE products_fts MATCH 'embroidered lawn' ORDER BY bm25(products_fts) LIMIT 20; "
+    "put the SQL on a single line."
 )
 
 def get_products_table_columns():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(products);")
-    columns = [row[1] for row in cursor.fetchall()]
-    conn.close()
-    return columns
+    with db.reader() as conn:
+        return db.table_columns(conn, 'products')
 
 def extract_first_sql_statement(text):
     # Find the first line that looks like a valid SQL statement
@@ -58,11 +59,8 @@ async def agent_query(request: Request):
             return JSONResponse({'error': 'Query is required'}, status_code=400)
         # Special case: if the user asks for total products, always return COUNT(*)
         if re.search(r"total products|how many products|number of products|count of products", user_query, re.I):
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as total FROM products")
-            total = cursor.fetchone()[0]
-            conn.close()
+            with db.reader() as conn:
+                total = conn.execute("SELECT COUNT(*) as total FROM products").fetchone()[0]
             explanation = f"There are {total} products in the database."
             return {'result': [{'total_products': total}], 'explanation': explanation}
         # Get products table columns
@@ -84,15 +82,9 @@ async def agent_query(request: Request):
         if not sql:
             return JSONResponse({'error': 'Could not extract a valid SQL statement from the LLM output.'}, status_code=500)
         print(f"[Agent SQL] {sql}")
-        # Actually run the SQL on the real database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        # Actually run the SQL: aggregates go to DuckDB when ANALYTICS_ENGINE=duckdb, the rest to the read-only SQLite pool
         try:
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-            # Try to get column names
-            col_names = [desc[0] for desc in cursor.description] if cursor.description else []
-            conn.close()
+            engine, col_names, rows = analytics.run_query(sql)
             # Return as list of dicts if possible
             if col_names:
                 result = [dict(zip(col_names, row)) for row in rows]
@@ -156,9 +148,8 @@ Summary: Outfitters' most expensive product is PKR 9,990. Sana Safinaz: PKR 9,86
             })
             with open(history_path, "w", encoding="utf-8") as f:
                 json.dump(history, f, ensure_ascii=False, indent=2)
-            return {'result': result, 'explanation': explanation}
+            return {'result': result, 'explanation': explanation, 'engine': engine}
         except Exception as e:
-            conn.close()
             return JSONResponse({'error': f'SQL execution failed: {e}', 'sql': sql}, status_code=500)
     except Exception as e:
         return JSONResponse({'error': str(e)}, status_code=500)
@@ -170,7 +161,8 @@ async def run_agentic(request: Request):
     count = int(data.get("count", 50))
     if not goal:
         return JSONResponse({"error": "Goal is required."}, status_code=400)
-    result = run_agent(goal, count)
+    # run_agent blocks on the scrape worker and the LLM; keep it off the event loop
+    result = await run_in_threadpool(run_agent, goal, count)
     # Return details (result/result.result is a dict or object)
     report_path = "result/report.txt"
     report = ""
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException
+import re
+import db
+
+router = APIRouter()
+
+def fts_match_query(text):
+    """Turn free text into an FTS5 query where every word must match as a prefix ("embroid" finds "embroidered")."""
+    terms = re.findall(r'\w+', text.lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+@router.get("/api/products/search")
+def search_products(q: str, brand: str = None, min_price: float = None, max_price: float = None,
+                    page: int = 1, page_size: int = 20):
+    match = fts_match_query(q)
+    if match is None:
+        raise HTTPException(status_code=400, detail="Query must contain at least one word")
+    page = max(1, page)
+    page_size = min(max(1, page_size), 100)
+    filters = "products_fts MATCH ? AND (? IS NULL OR p.brand = ? COLLATE NOCASE) AND (? IS NULL OR p.price >= ?) AND (? IS NULL OR p.price <= ?)"
+    params = (match, brand, brand, min_price, min_price, max_price, max_price)
+    with db.reader() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT COUNT(*) FROM products_fts JOIN products p ON p.id = products_fts.rowid WHERE {filters}", params)
+        total = c.fetchone()[0]
+        # bm25 weights follow db.FTS_COLUMNS: a hit in the name counts most, then material, then description
+        c.execute(f"""SELECT p.id, p.brand, p.name, p.price, p.material, p.url, p.scraped_at,
+                bm25(products_fts, 10.0, 1.0, 3.0) AS score,
+                snippet(products_fts, 1, '<b>', '</b>', '...', 16)
+            FROM products_fts JOIN products p ON p.id = products_fts.rowid
+            WHERE {filters} ORDER BY score LIMIT ? OFFSET ?""", params + (page_size, (page - 1) * page_size))
+        results = [
+            {"id": row[0], "brand": row[1], "name": row[2], "price": row[3], "material": row[4], "url": row[5],
+             "scraped_at": row[6], "score": round(-row[7], 3), "snippet": row[8]}
+            for row in c.fetchall()
+        ]
+    return {"query": q, "total": total, "page": page, "page_size": page_size, "results": results}
@@ -8,6 +8,7 @@ from pathlib import Path
 # Import the generate_report function from report_utils/report_gen.py
 sys.path.append(str(Path(__file__).parent.parent / "report_utils"))
 from report_gen import generate_report
+import db
 
 router = APIRouter()
 
@@ -24,19 +25,18 @@ async def deep_report(request: Request):
         with open("output/query_history.json", "r", encoding="utf-8") as f:
             query_history = json.load(f)
         # Fetch latest products from DB (optionally filter by brand in query)
-        import sqlite3, re
-        conn = sqlite3.connect("products_data.db")
-        c = conn.cursor()
+        import re
         # Try to extract brand from user query
         match = re.search(r"from ([a-zA-Z0-9_\- ]+)", user_query, re.I)
         brand = match.group(1).strip().lower().replace(' ', '_') if match else None
-        if brand:
-            c.execute("SELECT * FROM products WHERE lower(trim(brand)) = ? ORDER BY rowid DESC LIMIT 20", (brand,))
-        else:
-            c.execute("SELECT * FROM products ORDER BY rowid DESC LIMIT 20")
-        columns = [desc[0] for desc in c.description]
-        products = [dict(zip(columns, row)) for row in c.fetchall()]
-        conn.close()
+        with db.reader() as conn:
+            c = conn.cursor()
+            if brand:
+                c.execute("SELECT * FROM products WHERE lower(trim(brand)) = ? ORDER BY scraped_at DESC, id DESC LIMIT 20", (brand,))
+            else:
+                c.execute("SELECT * FROM products ORDER BY scraped_at DESC, id DESC LIMIT 20")
+            columns = [desc[0] for desc in c.description]
+            products = [dict(zip(columns, row)) for row in c.fetchall()]
         # Pass both SEO analytics, query history, and products to the report generator
         context = {
             "seo_analytics": seo_analytics,
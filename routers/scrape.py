@@ -1,44 +1,63 @@
-from fastapi import APIRouter, BackgroundTasks, Request
-import subprocess
-import os
-import json
+from fastapi import APIRouter, HTTPException, Request
+import db
+import scrapper
+import scrape_worker
 
 router = APIRouter()
-SCRAPE_STATUS_FILE = "scrape_status.json"
-
-def run_scraper(brand, count=50):
-    proc = subprocess.Popen(["python", "scrapper.py", "--brand", brand, "--count", str(count)])
-    proc.wait()
-    # Only write finished status if not stopped
-    if os.path.exists(SCRAPE_STATUS_FILE):
-        try:
-            with open(SCRAPE_STATUS_FILE) as f:
-                status = json.load(f)
-            if status.get("stopped"):
-                return
-        except Exception:
-            pass
-    with open(SCRAPE_STATUS_FILE, "w") as f:
-        json.dump({"brand": brand, "finished": True}, f)
+
+def last_cli_run():
+    """Latest finished scrape run, so scrapes started from the command line show up too."""
+    with db.reader(scrapper.DB_FILE) as conn:
+        row = conn.execute("SELECT brand, saved, finished_at FROM scrape_runs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT 1").fetchone()
+    if row is None:
+        return None
+    return {"brand": row[0], "count": row[1], "finished": True, "timestamp": row[2]}
+
+@router.post("/api/scrape/clear-status")
+def clear_scrape_status():
+    jobs, runs = scrape_worker.clear_finished()
+    return {"status": "cleared", "jobs": jobs, "runs": runs}
 
 @router.post("/api/scrape/{brand}")
-def trigger_scrape(brand: str, background_tasks: BackgroundTasks, request: Request):
-    # Clear status file at the start
-    if os.path.exists(SCRAPE_STATUS_FILE):
-        os.remove(SCRAPE_STATUS_FILE)
+def trigger_scrape(brand: str, request: Request):
     count = int(request.query_params.get('count', 50))
-    background_tasks.add_task(run_scraper, brand, count)
-    return {"status": "started", "brand": brand}
+    full = request.query_params.get('full', '').lower() in ('1', 'true', 'yes')
+    job = scrape_worker.get_worker().submit(brand, count, full=full)
+    return {"status": "started", "brand": job.brand, "job_id": job.id}
 
 @router.get("/api/scrape/status")
-def scrape_status():
-    if os.path.exists(SCRAPE_STATUS_FILE):
-        with open(SCRAPE_STATUS_FILE) as f:
-            return json.load(f)
-    return {"status": "idle"}
+def scrape_status(job_id: int = None):
+    # Without a job id this reports the most recent job, which is what the dashboard just started
+    if job_id is None:
+        jobs = scrape_worker.load_jobs(limit=1)
+        job = scrape_worker.get_worker().get(jobs[0].id) if jobs else None
+    else:
+        job = scrape_worker.get_worker().get(job_id)
+    run = last_cli_run()
+    if job is None:
+        return run or {"status": "idle"}
+    if job.status in ('queued', 'running'):
+        return {**job.to_dict(), "count": job.scraped}
+    if run and job_id is None and run["timestamp"] > job.finished_at:
+        return run
+    return {**job.to_dict(), "count": job.scraped, "finished": True, "timestamp": job.finished_at}
 
-@router.post("/api/scrape/clear-status")
-def clear_scrape_status():
-    if os.path.exists(SCRAPE_STATUS_FILE):
-        os.remove(SCRAPE_STATUS_FILE)
-    return {"status": "cleared"} 
\ No newline at end of file
+@router.get("/api/scrape/jobs")
+def scrape_jobs(limit: int = 50):
+    worker = scrape_worker.get_worker()
+    return [worker.jobs.get(job.id, job).to_dict() for job in scrape_worker.load_jobs(limit=limit)]
+
+@router.get("/api/scrape/domains")
+def scrape_domains():
+    return scrape_worker.get_worker().domain_stats()
+
+@router.get("/api/db/pool")
+def db_pool_stats():
+    return db.pool_stats()
+
+@router.get("/api/scrape/jobs/{job_id}")
+def scrape_job(job_id: int):
+    job = scrape_worker.get_worker().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -1,13 +1,14 @@
-from fastapi import APIRouter
-import sqlite3
+from fastapi import APIRouter, HTTPException
 import json
+import re
 import os
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from seo_logic import seo_scores
+from seo_logic import seo_scores_batch, DENSITY_MODE, DENSITY_MODES
+import db
 
 router = APIRouter()
 
@@ -31,14 +32,14 @@ SYSTEM_PROMPT = (
 )
 
 def get_brand_descriptions():
-    conn = sqlite3.connect("products_data.db")
-    c = conn.cursor()
-    c.execute("SELECT brand, description FROM products WHERE description IS NOT NULL AND description != ''")
+    with db.reader() as conn:
+        c = conn.cursor()
+        c.execute("SELECT brand, description FROM products WHERE description IS NOT NULL AND description != ''")
+        rows = c.fetchall()
     brand_descs = {}
-    for brand, desc in c.fetchall():
+    for brand, desc in rows:
         norm_brand = brand.strip().title()
         brand_descs.setdefault(norm_brand, []).append(desc)
-    conn.close()
     return brand_descs
 
 def extract_keywords_for_brand(brand, descriptions):
@@ -77,7 +78,11 @@ def extract_keywords_for_brand(brand, descriptions):
     return []
 
 @router.get("/api/seo/keywords")
-def seo_keywords():
+def seo_keywords(density_mode: str = None):
+    # Keyword density is 'legacy' (word counts) or 'phrase' (whole keyword phrases); SEO_DENSITY_MODE sets the default
+    density_mode = (density_mode or DENSITY_MODE).strip().lower()
+    if density_mode not in DENSITY_MODES:
+        raise HTTPException(status_code=400, detail=f"density_mode must be one of: {', '.join(DENSITY_MODES)}")
     brand_descs = get_brand_descriptions()
     # Load cached or generated keywords if available
     if os.path.exists("seo_keywords.json"):
@@ -99,12 +104,13 @@ def seo_keywords():
         else:
             keywords = extract_keywords_for_brand(norm_brand, descs)
             keyword_map[norm_brand] = keywords
-        # Calculate SEO scores for each description
-        scores = [seo_scores(desc, norm_brand, keyword_map, descs) for desc in descs]
+        # Calculate SEO scores for each description; every description is analysed once for all scorers
+        scores = seo_scores_batch(descs, norm_brand, keyword_map, density_mode=density_mode)
         # Remove 'commercial_intent' from scores if present
         avg_scores = {k: round(sum(d[k] for d in scores) / len(scores), 2) for k in scores[0]} if scores else {}
         result[norm_brand] = {
             "keywords": keywords,
+            "density_mode": density_mode,
             "avg_scores": avg_scores,
             "sample_scores": scores[:3]
         }
@@ -119,9 +125,8 @@ def seo_keywords():
 
 @router.get("/api/products/count")
 def get_product_count():
-    conn = sqlite3.connect("products_data.db")
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM products")
-    count = c.fetchone()[0]
-    conn.close()
+    with db.reader() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM products")
+        count = c.fetchone()[0]
     return {"total_products": count}
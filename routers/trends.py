@@ -1,55 +1,86 @@
 from fastapi import APIRouter
-import sqlite3
+import analytics
+import db
 
 router = APIRouter()
 
 @router.get("/api/trends/count")
 def product_count_trend():
-    conn = sqlite3.connect("products_data.db")
-    c = conn.cursor()
-    c.execute("SELECT DATE(scraped_date), COUNT(*) FROM products GROUP BY DATE(scraped_date)")
-    data = [{"date": row[0], "count": row[1]} for row in c.fetchall()]
-    conn.close()
+    with db.reader() as conn:
+        c = conn.cursor()
+        c.execute("SELECT day, SUM(products) FROM daily_brand_stats WHERE day != '' GROUP BY day ORDER BY day")
+        data = [{"date": row[0], "count": row[1]} for row in c.fetchall()]
     return data
 
 @router.get("/api/trends/price")
 def price_trend():
-    conn = sqlite3.connect("products_data.db")
-    c = conn.cursor()
-    c.execute("SELECT DATE(scraped_date), AVG(price) FROM products GROUP BY DATE(scraped_date)")
-    data = [{"date": row[0], "avg_price": row[1]} for row in c.fetchall()]
-    conn.close()
+    with db.reader() as conn:
+        c = conn.cursor()
+        c.execute("""SELECT day, SUM(price_sum) / NULLIF(SUM(priced), 0), MIN(min_price), MAX(max_price)
+            FROM daily_brand_stats WHERE day != '' GROUP BY day ORDER BY day""")
+        data = [{"date": row[0], "avg_price": row[1], "min_price": row[2], "max_price": row[3]} for row in c.fetchall()]
     return data
 
+@router.get("/api/trends/price-drops")
+def price_drops(brand: str = None, limit: int = 50):
+    """Products whose latest recorded price is below the one before it."""
+    with db.reader() as conn:
+        c = conn.cursor()
+        c.execute("""WITH latest AS (
+                SELECT url, price, observed_at,
+                       LAG(price) OVER (PARTITION BY url ORDER BY id) AS previous_price,
+                       ROW_NUMBER() OVER (PARTITION BY url ORDER BY id DESC) AS position
+                FROM price_history)
+            SELECT p.brand, p.name, p.url, latest.previous_price, latest.price, latest.observed_at
+            FROM latest JOIN products p ON p.url = latest.url
+            WHERE latest.position = 1 AND latest.price < latest.previous_price AND (? IS NULL OR p.brand = ?)
+            ORDER BY latest.observed_at DESC LIMIT ?""", (brand, brand, limit))
+        data = [
+            {"brand": row[0], "name": row[1], "url": row[2], "previous_price": row[3], "price": row[4],
+             "drop_pct": round((row[3] - row[4]) / row[3] * 100, 1) if row[3] else None, "observed_at": row[5]}
+            for row in c.fetchall()
+        ]
+    return data
+
+@router.get("/api/analytics/price-history")
+def price_history_by_month(brand: str = None):
+    """Monthly price-change statistics per brand; served from the Parquet export when ANALYTICS_ENGINE=duckdb."""
+    engine, _, rows = analytics.run_query("""SELECT p.brand, substr(h.observed_at, 1, 7) AS month, COUNT(*) AS changes,
+            COUNT(DISTINCT h.url) AS products, AVG(h.price), MIN(h.price), MAX(h.price)
+        FROM price_history h JOIN products p ON p.url = h.url
+        WHERE h.observed_at IS NOT NULL AND (? IS NULL OR p.brand = ?)
+        GROUP BY p.brand, month ORDER BY month, p.brand""", (brand, brand))
+    return {
+        "engine": engine,
+        "months": [
+            {"brand": row[0], "month": row[1], "changes": row[2], "products": row[3],
+             "avg_price": round(row[4], 2) if row[4] is not None else None, "min_price": row[5], "max_price": row[6]}
+            for row in rows
+        ]
+    }
+
 @router.get("/api/analytics/products")
 def product_analytics():
-    conn = sqlite3.connect("products_data.db")
-    c = conn.cursor()
-    # Product count and average price per brand
-    c.execute("SELECT brand, COUNT(*), AVG(CASE WHEN price IS NOT NULL AND price != '' AND price != 'None' THEN CAST(price AS FLOAT) END) FROM products GROUP BY brand")
-    brand_stats = [
-        {"brand": row[0], "count": row[1], "avg_price": round(row[2], 2) if row[2] is not None else None}
-        for row in c.fetchall()
-    ]
-    # Price distribution buckets (PKR)
-    buckets = [(0, 5000), (5000, 8000), (8000, 10000), (10000, float('inf'))]
-    bucket_labels = ["< 5,000", "5,000-8,000", "8,000-10,000", "10,000+"]
-    bucket_counts = [0] * len(buckets)
-    c.execute("SELECT price FROM products WHERE price IS NOT NULL AND price != '' AND price != 'None'")
-    for (price_str,) in c.fetchall():
-        try:
-            price = float(price_str)
-            for i, (low, high) in enumerate(buckets):
-                if low <= price < high:
-                    bucket_counts[i] += 1
-                    break
-        except Exception:
-            continue
-    conn.close()
+    with db.reader() as conn:
+        c = conn.cursor()
+        # Current catalogue per brand; daily_brand_stats counts a product once per day it was seen, so it cannot be summed
+        # here
+        c.execute("""SELECT brand, COUNT(*), AVG(price), MIN(price), MAX(price)
+            FROM products GROUP BY brand ORDER BY brand""")
+        brand_stats = [
+            {"brand": row[0], "count": row[1], "avg_price": round(row[2], 2) if row[2] is not None else None,
+             "min_price": row[3], "max_price": row[4]}
+            for row in c.fetchall()
+        ]
+        # Price distribution buckets (PKR)
+        bucket_labels = ["< 5,000", "5,000-8,000", "8,000-10,000", "10,000+"]
+        c.execute(f"""SELECT {', '.join(f'COALESCE(SUM({db.bucket_condition('price', low, high)}), 0)' for _, low, high in db.PRICE_BUCKETS)}
+            FROM products WHERE price IS NOT NULL""")
+        bucket_counts = list(c.fetchone())
     return {
         "brand_stats": brand_stats,
         "price_distribution": {
             "labels": bucket_labels,
             "counts": bucket_counts
         }
-    } 
\ No newline at end of file
+    } 
@@ -0,0 +1,370 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from playwright.async_api import async_playwright
+
+import db
+import scrapper
+
+logger = logging.getLogger(__name__)
+
+JOB_CONCURRENCY = 2  # Scrape jobs running at once; jobs for the same brand never overlap
+JOB_SAVE_INTERVAL = 2.0  # Seconds between progress writes of a running job
+
+JOB_COLUMNS = ['id', 'brand', 'count', 'full', 'status', 'submitted_at', 'started_at', 'finished_at', 'updated_at',
+               'run_id', 'scraped', 'unchanged', 'failed', 'failed_urls', 'last_url', 'error', 'owner']
+
+def utc_timestamp():
+    return datetime.utcnow().isoformat() + 'Z'
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.rstrip('Z')) if value else None
+
+def worker_owner():
+    """host:pid recorded on the jobs this process runs."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def process_alive(pid):
+    if os.name == 'nt':
+        import ctypes
+        # os.kill(pid, 0) would terminate the process on Windows
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+@dataclass
+class ScrapeJob:
+    id: int
+    brand: str
+    count: int = 50
+    full: bool = False
+    status: str = 'queued'
+    submitted_at: str = field(default_factory=utc_timestamp)
+    started_at: str = None
+    finished_at: str = None
+    updated_at: str = None
+    run_id: int = None
+    scraped: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    failed_urls: list = field(default_factory=list)
+    last_url: str = None
+    error: str = None
+    owner: str = field(default_factory=worker_owner)
+    future: Future = field(default_factory=Future, repr=False)
+
+    @classmethod
+    def from_row(cls, row):
+        job = cls(**{k: row[k] for k in JOB_COLUMNS})
+        job.full = bool(job.full)
+        job.failed_urls = json.loads(job.failed_urls or '[]')
+        return job
+
+    @property
+    def result(self):
+        return {"brand": self.brand, "count": self.scraped, "unchanged": self.unchanged, "failed_urls": self.failed_urls}
+
+    def wait(self, timeout=None):
+        """Block until the job has run and return its result dict."""
+        return self.future.result(timeout)
+
+    def to_dict(self):
+        data = {k: getattr(self, k) for k in JOB_COLUMNS}
+        done = self.scraped + self.unchanged
+        started = parse_timestamp(self.started_at)
+        ended = parse_timestamp(self.finished_at) or datetime.utcnow()
+        elapsed = (ended - started).total_seconds() if started else 0
+        data['progress'] = round(min(1.0, done / self.count), 3) if self.count else None
+        data['rate_per_min'] = round(done / elapsed * 60, 1) if elapsed > 0 else None
+        data['elapsed_seconds'] = round(elapsed, 1)
+        return data
+
+def save_job(job, filename=None):
+    values = [getattr(job, k) for k in JOB_COLUMNS]
+    values[JOB_COLUMNS.index('failed_urls')] = json.dumps(job.failed_urls)
+    with db.writer(filename or scrapper.DB_FILE) as conn:
+        if job.id is None:
+            job.id = conn.execute(f"INSERT INTO scrape_jobs ({', '.join(JOB_COLUMNS[1:])}) VALUES ({', '.join(['?'] * (len(JOB_COLUMNS) - 1))})",
+                                  values[1:]).lastrowid
+        else:
+            assignments = ', '.join(f"{k} = ?" for k in JOB_COLUMNS[1:])
+            conn.execute(f"UPDATE scrape_jobs SET {assignments} WHERE id = ?", values[1:] + [job.id])
+    return job
+
+def load_jobs(filename=None, job_id=None, limit=50):
+    """Jobs from the scrape_jobs table, newest first; a single job (or None) when ``job_id`` is given."""
+    with db.reader(filename or scrapper.DB_FILE) as conn:
+        conn.row_factory = sqlite3.Row
+        if job_id is not None:
+            rows = conn.execute("SELECT * FROM scrape_jobs WHERE id = ?", (job_id,)).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM scrape_jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    jobs = [ScrapeJob.from_row(row) for row in rows]
+    if job_id is not None:
+        return jobs[0] if jobs else None
+    return jobs
+
+def abandon_jobs(filename=None):
+    """Mark queued or running jobs that nothing will finish any more as interrupted.
+
+    Called before this process starts its worker thread, so its own jobs are
+    stale, and so are those of processes on this host that have exited and
+    those recorded before jobs had an owner. Jobs of live processes, and of
+    other hosts sharing the database, are left alone.
+    """
+    me = worker_owner()
+    host = socket.gethostname()
+
+    def stale(owner):
+        if owner is None or owner == me:
+            return True
+        owner_host, _, pid = owner.rpartition(':')
+        return owner_host == host and not process_alive(int(pid))
+
+    with db.writer(filename or scrapper.DB_FILE) as conn:
+        rows = conn.execute("SELECT id, owner FROM scrape_jobs WHERE status IN ('queued', 'running')").fetchall()
+        finished_at = utc_timestamp()
+        conn.executemany("UPDATE scrape_jobs SET status = 'interrupted', finished_at = ? WHERE id = ?",
+                         [(finished_at, job_id) for job_id, owner in rows if stale(owner)])
+
+def clear_finished(filename=None):
+    """Delete finished job and run history; queued or running jobs and resumable runs are kept.
+
+    Runs older than a brand's latest finished run go too, since a resume only
+    ever looks at the latest one. Returns the number of jobs and runs removed.
+    """
+    with db.writer(filename or scrapper.DB_FILE) as conn:
+        jobs = conn.execute("DELETE FROM scrape_jobs WHERE status IN ('finished', 'failed', 'interrupted')").rowcount
+        runs = conn.execute("""DELETE FROM scrape_runs WHERE status = 'finished'
+                               OR id < (SELECT MAX(id) FROM scrape_runs AS later
+                                        WHERE later.brand = scrape_runs.brand AND later.status = 'finished')""").rowcount
+    return jobs, runs
+
+class ScrapeWorker:
+    """Schedules scrape jobs on a warm browser in a background thread.
+
+    The worker owns its own event loop, so synchronous callers (FastAPI
+    routes, the agent graph) can ``submit`` jobs from any thread and ``wait``
+    on the returned job. Up to ``job_concurrency`` jobs run at once and two
+    jobs for the same brand never overlap; later ones stay queued until the
+    brand is free. Job state and per-product progress are kept in the
+    scrape_jobs table. Chromium, the HTTP client and the PagePool are created
+    on the first job that needs them and shared by every job until ``stop``;
+    a browser that disconnects is relaunched on the next job.
+    """
+
+    def __init__(self, job_concurrency=JOB_CONCURRENCY, concurrency=None):
+        self.job_concurrency = job_concurrency
+        self.concurrency = concurrency
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._wakeup = None
+        self._stopping = False
+        self._queued = deque()
+        self._running = {}
+        self._browser = None
+        self._browser_lock = None
+        self._page_pool = None
+        self._http_client = None
+        self._domain_limits = {}
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            abandon_jobs()
+            self._ready.clear()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='scrape-worker', daemon=True)
+            self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout=30):
+        if not (self._thread and self._thread.is_alive()):
+            return
+        self._loop.call_soon_threadsafe(self._request_stop)
+        self._thread.join(timeout)
+
+    def submit(self, brand, count=50, full=False):
+        """Queue a scrape for ``brand`` and return its ScrapeJob immediately."""
+        self.start()
+        job = save_job(ScrapeJob(id=None, brand=scrapper.normalize_brand_name(brand), count=count, full=full))
+        with self._lock:
+            self.jobs[job.id] = job
+        self._loop.call_soon_threadsafe(self._enqueue, job)
+        logger.info(f"Queued scrape job {job.id} for {job.brand} ({count} products)")
+        return job
+
+    def get(self, job_id):
+        """The live job when this process runs it, otherwise its stored state."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        return job or load_jobs(job_id=job_id)
+
+    def domain_stats(self):
+        """Current adaptive limits of every domain the worker's jobs have hit."""
+        return [controller.snapshot() for controller in list(self._domain_limits.values())]
+
+    def _run(self):
+        asyncio.run(self._serve())
+
+    def _enqueue(self, job):
+        self._queued.append(job)
+        self._wakeup.set()
+
+    def _request_stop(self):
+        self._stopping = True
+        self._wakeup.set()
+
+    def _dispatch(self):
+        # Start queued jobs in submission order, skipping brands that already have a job running
+        for job in list(self._queued):
+            if len(self._running) >= self.job_concurrency:
+                break
+            if job.brand in self._running:
+                continue
+            self._queued.remove(job)
+            task = asyncio.create_task(self._run_job(job))
+            self._running[job.brand] = task
+            task.add_done_callback(lambda _, brand=job.brand: self._job_done(brand))
+
+    def _job_done(self, brand):
+        self._running.pop(brand, None)
+        self._wakeup.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._browser_lock = asyncio.Lock()
+        self._ready.set()
+        async with async_playwright() as p:
+            self._playwright = p
+            try:
+                while not self._stopping:
+                    self._dispatch()
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+            finally:
+                for task in self._running.values():
+                    task.cancel()
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
+                await self._close_browser()
+                if self._http_client:
+                    await self._http_client.aclose()
+                scrapper.close_parse_pool()
+
+    async def _close_browser(self):
+        if self._page_pool:
+            await self._page_pool.close()
+            self._page_pool = None
+        if self._browser:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser and not self._browser.is_connected():
+                logger.warning("Scrape worker browser disconnected; relaunching")
+                await self._close_browser()
+            if self._browser is None:
+                self._browser = await self._playwright.chromium.launch(headless=True, args=scrapper.BROWSER_ARGS)
+                self._page_pool = scrapper.PagePool(self._browser)
+            return self._browser
+
+    def _progress(self, job):
+        last_saved = time.monotonic()
+
+        def update(counts):
+            nonlocal last_saved
+            job.run_id = counts['run_id']
+            job.scraped = counts['scraped']
+            job.unchanged = counts['unchanged']
+            job.failed = counts['failed']
+            job.last_url = counts['url']
+            if counts['outcome'] == 'failed':
+                job.failed_urls.append(counts['url'])
+            job.updated_at = utc_timestamp()
+            if time.monotonic() - last_saved >= JOB_SAVE_INTERVAL:
+                last_saved = time.monotonic()
+                save_job(job)
+        return update
+
+    async def _run_job(self, job):
+        # Everything up to resolving the future is guarded, so wait() never hangs on a job that failed to start
+        try:
+            job.status = 'running'
+            job.started_at = job.updated_at = utc_timestamp()
+            save_job(job)
+            config = scrapper.load_config()
+            if job.brand not in config:
+                raise ValueError(f"Brand '{job.brand}' not found in config.")
+            if self._http_client is None:
+                self._http_client = scrapper.make_http_client()
+            browser = None
+            if not scrapper.uses_http_fast_path(config[job.brand]):
+                browser = await self._ensure_browser()
+            saved, failed_urls = await scrapper.scrape_brand(
+                job.brand, config, browser, max_products=job.count, concurrency=self.concurrency,
+                domain_limits=self._domain_limits, http_client=self._http_client, full=job.full,
+                page_pool=self._page_pool, progress=self._progress(job))
+            job.scraped = saved
+            job.failed_urls = failed_urls
+            job.failed = len(failed_urls)
+            job.status = 'finished'
+        except asyncio.CancelledError:
+            job.status = 'interrupted'
+            job.error = 'Worker stopped'
+        except Exception as e:
+            logger.error(f"Scrape job {job.id} for {job.brand} failed: {e}")
+            job.error = str(e)
+            job.status = 'failed'
+        job.finished_at = job.updated_at = utc_timestamp()
+        try:
+            save_job(job)
+        except Exception as e:
+            logger.error(f"Could not save the final state of scrape job {job.id}: {e}")
+        with self._lock:
+            self.jobs.pop(job.id, None)
+        if job.error:
+            job.future.set_exception(RuntimeError(job.error))
+        else:
+            job.future.set_result(job.result)
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_worker():
+    """Return the process-wide ScrapeWorker, creating it on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = ScrapeWorker()
+        return _worker
+
+def shutdown():
+    if _worker is not None:
+        _worker.stop()
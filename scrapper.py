@@ -9,20 +9,87 @@ import sqlite3
 import logging
 import time
 import os
+import hashlib
+import functools
 from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+import soupsieve
 import argparse
+from contextlib import asynccontextmanager, aclosing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import httpx
+import db
+from normalize import normalize_brand_name, normalize_url
+from urllib.parse import urlparse, urljoin, parse_qsl, urlencode
 
 
+# Listing waits are upper bounds; readiness is detected from card growth and network activity.
+# SCROLL_COUNT is the default cap on listing pagination steps when the brand's
+# "pagination" config sets no max_scrolls / max_clicks / max_pages.
 SCROLL_COUNT = 3
 SCROLL_WAIT = 2000 
 EXTRA_SCROLL_WAIT = 1000  
 DYNAMIC_WAIT = 5000 
 SELECTOR_WAIT = 15000  
+READINESS_POLL = 100  # ms between readiness checks
+NETWORK_IDLE_WINDOW = 500  # ms with at most NETWORK_IDLE_MAX_INFLIGHT requests before the network counts as settled
+NETWORK_IDLE_MAX_INFLIGHT = 2  # tolerate long-polling/analytics connections that never finish
 MAX_PRODUCTS = 50
+DB_FILE = db.DB_FILE
+PRODUCT_CONCURRENCY = 4  # Product pages fetched at once; per-brand "concurrency" overrides, --concurrency overrides both
+DOMAIN_CONCURRENCY = 8  # Ceiling on pages open against one domain across all brands; per-brand "domain_concurrency" overrides
+DOMAIN_INITIAL_CONCURRENCY = 2  # AIMD starting point per domain; it grows towards the ceiling while the site keeps up
+DOMAIN_DECREASE_FACTOR = 0.5  # Multiplicative cut applied on 429/5xx, errors and latency spikes
+DOMAIN_SLOW_FACTOR = 3  # Latency above this multiple of the best seen (and over 1s) counts as congestion
+DOMAIN_DELAY_STEP = 0.25  # Seconds of request spacing added on throttling and removed again as requests succeed
+DOMAIN_MAX_DELAY = 10
+RETRY_AFTER_MAX = 60
+CONTEXT_MAX_NAVIGATIONS = 200  # Page loads served by one browser context before it is replaced
+CONTEXT_MAX_HEAP_MB = 256  # JS heap of a returned page above which its context is replaced
+SAVE_BATCH_SIZE = 20  # Products checkpointed to SQLite per transaction
+FTS_SYNC_INTERVAL = 60  # Seconds between full-text index syncs of a running scrape; the final checkpoint always syncs
+PARSE_WORKERS = min(4, os.cpu_count() or 1)  # Processes parsing fast-path HTML off the event loop; 0 parses inline
 FALLBACK_SELECTORS = [
     'a.is--href-replaced',
     'a[href*="/products/"]'
 ]
+# Requests aborted before they leave the browser. A brand can override either list with
+# "blocking": {"resource_types": [...], "domains": [...]}, or disable blocking with "blocking": false.
+DEFAULT_BLOCKED_RESOURCE_TYPES = ['image', 'media', 'font']
+DEFAULT_BLOCKED_DOMAINS = [
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'googleadservices.com',
+    'facebook.net',
+    'facebook.com',
+    'hotjar.com',
+    'clarity.ms',
+    'tiktok.com',
+    'snapchat.com',
+    'pinterest.com',
+    'klaviyo.com',
+]
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding'
+]
+# Browserless fast path for brands with "js_rendered": false or a "json_endpoint" template
+HTTP_TIMEOUT = 30
+HTTP_MAX_CONNECTIONS = 20
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -63,7 +130,183 @@ def load_config(config_path='scrape_struct.json'):
     with open(config_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def collect_text(el, parts):
+    # Same strings as BeautifulSoup's get_text(): comments, scripts and styles are skipped, tails are kept
+    if isinstance(el.tag, str) and el.tag not in ('script', 'style'):
+        if el.text:
+            parts.append(el.text)
+        for child in el:
+            collect_text(child, parts)
+            if child.tail:
+                parts.append(child.tail)
+    return parts
+
+def description_text(desc_html, url):
+    if not desc_html or not desc_html.strip():
+        return ""
+    root = lxml_html.fragment_fromstring(desc_html, create_parent='div')
+    # For Alkaram, remove disclaimer div if present
+    if 'alkaram' in url or 'alkaramstudio' in url:
+        disclaimers = root.xpath('.//div[contains(concat(" ", normalize-space(@class), " "), " tab--disclaimer ")]')
+        if disclaimers:
+            disclaimers[0].drop_tree()
+    return clean_text(' '.join(part.strip() for part in collect_text(root, []) if part.strip()))
+
+_parse_pool = None
+
+def parse_pool():
+    """Process pool for CPU-bound HTML parsing, created on first use.
+
+    Spawned rather than forked because the scraper also runs inside the
+    threaded API server.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(PARSE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _parse_pool
+
+def close_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+        _parse_pool = None
+
+async def run_parser(fn, *args):
+    """Run a parsing function in the parse pool so the event loop only does I/O."""
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(parse_pool(), fn, *args)
+    except BrokenProcessPool:
+        logger.warning("Parse pool broke; restarting it")
+        _parse_pool = None
+        return await loop.run_in_executor(parse_pool(), fn, *args)
+
+def extract_material(data, product_page_conf):
+    if product_page_conf.get('material_in_description') and 'description' in data:
+        match = re.search(r'Material:?\s*([\w\s,]+)', data['description'], re.IGNORECASE)
+        if match:
+            data['material'] = match.group(1).strip()
+    return data
+
+# Product page fields and the config keys holding their selectors
+FIELD_SELECTORS = {
+    'name': 'name_selector',
+    'price': 'price_selector',
+    'description': 'description_selector',
+    'specifications': 'specifications_selector',
+}
+
+# Runs in the page and returns every field in one round trip. Mirrors
+# extract_fields_per_selector: Khaadi brand+name concatenation, Alkaram
+# disclaimer removal, and BeautifulSoup-style get_text(separator=' ', strip=True)
+# for descriptions. Fields whose selector only Playwright understands are
+# resolved beforehand and passed in as element handles.
+EXTRACTION_SCRIPT = """(handles) => {
+    const conf = %s;
+    const clean = (text) => (text || '').trim().replace(/\\s+/g, ' ');
+    const find = (field) => field in handles ? handles[field] : document.querySelector(conf[field]);
+    const findAll = (field) => field in handles ? handles[field] : Array.from(document.querySelectorAll(conf[field]));
+    const strippedText = (root) => {
+        const parts = [];
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        while (walker.nextNode()) {
+            const parent = walker.currentNode.parentNode.nodeName;
+            if (parent === 'SCRIPT' || parent === 'STYLE') continue;
+            const text = walker.currentNode.nodeValue.trim();
+            if (text) parts.push(text);
+        }
+        return parts.join(' ');
+    };
+    const url = window.location.href;
+    const data = {};
+    if (url.includes('khaadi') || document.title.toLowerCase().includes('khaadi')) {
+        const brand = document.querySelector('div.product-brand');
+        const name = document.querySelector('h1.product-name');
+        data.name = ((brand ? clean(brand.textContent) : '') + ' ' + (name ? clean(name.textContent) : '')).trim();
+    } else if ('name' in conf) {
+        const el = find('name');
+        if (el) data.name = clean(el.textContent);
+    }
+    if ('price' in conf) {
+        const el = find('price');
+        if (el) data.price = el.textContent;
+    }
+    if ('description' in conf) {
+        const el = find('description');
+        if (el) {
+            let root = el;
+            if (url.includes('alkaram')) {
+                root = el.cloneNode(true);
+                const disclaimer = root.querySelector('div.tab--disclaimer');
+                if (disclaimer) disclaimer.remove();
+            }
+            data.description = clean(strippedText(root));
+        }
+    }
+    if ('specifications' in conf) {
+        data.specifications = findAll('specifications').map((el) => clean(el.textContent));
+    }
+    return data;
+}"""
+
+_extraction_scripts = {}
+
+def is_css_selector(selector):
+    """True if ``selector`` is plain CSS that document.querySelector can run."""
+    try:
+        soupsieve.compile(selector)
+        return True
+    except Exception:
+        return False
+
+def compile_extraction_script(product_page_conf):
+    """Build (and cache) the extraction script for a brand's product page config.
+
+    Returns (script, playwright_selectors) where playwright_selectors maps the
+    fields whose selectors must be resolved by Playwright before the script runs.
+    """
+    key = json.dumps(product_page_conf, sort_keys=True)
+    if key not in _extraction_scripts:
+        selectors = {field: product_page_conf[conf_key] for field, conf_key in FIELD_SELECTORS.items()
+                     if conf_key in product_page_conf}
+        if 'spec_fields' not in product_page_conf:
+            selectors.pop('specifications', None)
+        playwright_selectors = {field: selector for field, selector in selectors.items() if not is_css_selector(selector)}
+        _extraction_scripts[key] = (EXTRACTION_SCRIPT % json.dumps(selectors), playwright_selectors)
+    return _extraction_scripts[key]
+
 async def extract_fields_from_product_page(page, product_page_conf):
+    """Extract all product fields with a single page.evaluate call."""
+    script, playwright_selectors = compile_extraction_script(product_page_conf)
+    handles = {}
+    for field, selector in playwright_selectors.items():
+        if field == 'specifications':
+            handles[field] = await page.query_selector_all(selector)
+        else:
+            handles[field] = await page.query_selector(selector)
+    try:
+        raw = await page.evaluate(script, handles)
+    except Exception as e:
+        logger.warning(f"Compiled extraction failed on {page.url}, falling back to per-selector extraction: {e}")
+        return await extract_fields_per_selector(page, product_page_conf)
+    data = {}
+    if 'name' in raw:
+        data['name'] = raw['name']
+    if 'price' in raw:
+        data['price'] = clean_price(raw['price'])
+    if 'description' in raw:
+        data['description'] = raw['description']
+    for text in raw.get('specifications', []):
+        for label, key in product_page_conf['spec_fields'].items():
+            if label.lower() in text.lower():
+                data[key] = text
+    return extract_material(data, product_page_conf)
+
+async def extract_fields_per_selector(page, product_page_conf):
+    """Original one-round-trip-per-field extraction, kept as a fallback and benchmark baseline."""
     data = {}
     # Special logic for Khaadi: concatenate product-brand and product-name
     if 'khaadi' in page.url or 'khaadi' in (await page.title()).lower():
@@ -87,17 +330,7 @@ async def extract_fields_from_product_page(page, product_page_conf):
     if 'description_selector' in product_page_conf:
         el = await page.query_selector(product_page_conf['description_selector'])
         if el:
-            desc_html = await el.inner_html()
-            # For Alkaram, remove disclaimer div if present
-            if 'alkaram' in page.url or 'alkaramstudio' in page.url:
-                soup = BeautifulSoup(desc_html, 'html.parser')
-                disclaimer_div = soup.find('div', class_='tab--disclaimer')
-                if disclaimer_div:
-                    disclaimer_div.decompose()
-                desc_text = soup.get_text(separator=' ', strip=True)
-                data['description'] = clean_text(desc_text)
-            else:
-                data['description'] = clean_text(BeautifulSoup(desc_html, 'html.parser').get_text(separator=' ', strip=True))
+            data['description'] = await run_parser(description_text, await el.inner_html(), page.url)
     # Specifications (if any)
     if 'specifications_selector' in product_page_conf and 'spec_fields' in product_page_conf:
         spec_els = await page.query_selector_all(product_page_conf['specifications_selector'])
@@ -106,26 +339,356 @@ async def extract_fields_from_product_page(page, product_page_conf):
             for label, key in product_page_conf['spec_fields'].items():
                 if label.lower() in text.lower():
                     data[key] = text
-    # Material in description
-    if product_page_conf.get('material_in_description') and 'description' in data:
-        match = re.search(r'Material:?\s*([\w\s,]+)', data['description'], re.IGNORECASE)
-        if match:
-            data['material'] = match.group(1).strip()
-    return data
+    return extract_material(data, product_page_conf)
+
+def select_one(soup, selector):
+    try:
+        return soup.select_one(selector)
+    except Exception as e:
+        # Playwright-only selectors (e.g. :text()) have no static-HTML equivalent
+        logger.warning(f"Selector '{selector}' is not supported on static HTML: {e}")
+        return None
+
+def extract_fields_from_html(html, url, product_page_conf):
+    """Static-HTML counterpart of extract_fields_from_product_page for the HTTP fast path."""
+    soup = BeautifulSoup(html, 'lxml')
+    data = {}
+    title = soup.title.get_text() if soup.title else ''
+    # Special logic for Khaadi: concatenate product-brand and product-name
+    if 'khaadi' in url or 'khaadi' in title.lower():
+        brand_div = soup.select_one('div.product-brand')
+        name_h1 = soup.select_one('h1.product-name')
+        brand_text = clean_text(brand_div.get_text()) if brand_div else ''
+        name_text = clean_text(name_h1.get_text()) if name_h1 else ''
+        data['name'] = f"{brand_text} {name_text}".strip()
+    elif 'name_selector' in product_page_conf:
+        el = select_one(soup, product_page_conf['name_selector'])
+        if el:
+            data['name'] = clean_text(el.get_text())
+    if 'price_selector' in product_page_conf:
+        el = select_one(soup, product_page_conf['price_selector'])
+        if el:
+            data['price'] = clean_price(el.get_text())
+    if 'description_selector' in product_page_conf:
+        el = select_one(soup, product_page_conf['description_selector'])
+        if el:
+            data['description'] = description_text(el.decode_contents(), url)
+    if 'specifications_selector' in product_page_conf and 'spec_fields' in product_page_conf:
+        for el in soup.select(product_page_conf['specifications_selector']):
+            text = clean_text(el.get_text())
+            for label, key in product_page_conf['spec_fields'].items():
+                if label.lower() in text.lower():
+                    data[key] = text
+    return extract_material(data, product_page_conf)
+
+def extract_fields_from_product_json(payload, url, product_page_conf):
+    """Extract fields from a Shopify-style product JSON document (``{"product": {...}}``)."""
+    product = payload.get('product', payload)
+    data = {}
+    if product.get('title'):
+        data['name'] = clean_text(product['title'])
+    variants = product.get('variants') or []
+    if variants and variants[0].get('price') is not None:
+        data['price'] = clean_price(str(variants[0]['price']))
+    if product.get('body_html'):
+        data['description'] = description_text(product['body_html'], url)
+    return extract_material(data, product_page_conf)
+
+def retry_after_seconds(value):
+    """Seconds from a Retry-After header given as a number (HTTP dates are ignored)."""
+    try:
+        return min(RETRY_AFTER_MAX, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return 0.0
 
-async def robust_goto(page, url, max_retries=3, backoff=2):
+def retry_delay(backoff, attempt, domain=None, retry_after=0.0):
+    return max(backoff * attempt, domain.delay if domain else 0.0, retry_after)
+
+async def robust_goto(page, url, max_retries=3, backoff=2, domain=None):
+    """Navigate with retries, treating 429/5xx like a failed load.
+
+    Each attempt's latency and outcome is reported to ``domain`` (a
+    DomainController) so the domain's concurrency can adapt.
+    """
     for attempt in range(1, max_retries + 1):
+        retry_after = 0.0
+        started = time.perf_counter()
         try:
             logger.info(f"Navigating to {url} (attempt {attempt})")
-            await page.goto(url, wait_until='domcontentloaded', timeout=60000)
-            return True
+            response = await page.goto(url, wait_until='domcontentloaded', timeout=60000)
+            status = response.status if response else 200
+            if domain:
+                domain.record(time.perf_counter() - started, status=status)
+            if status != 429 and status < 500:
+                return True
+            logger.warning(f"Failed to load {url} (attempt {attempt}): HTTP {status}")
+            retry_after = retry_after_seconds(response.headers.get('retry-after'))
         except Exception as e:
+            if domain:
+                domain.record(time.perf_counter() - started, error=e)
             logger.warning(f"Failed to load {url} (attempt {attempt}): {e}")
-            if attempt < max_retries:
-                await page.wait_for_timeout(backoff * 1000 * attempt)
-            else:
-                logger.error(f"Giving up on {url} after {max_retries} attempts.")
+        if attempt < max_retries:
+            await page.wait_for_timeout(retry_delay(backoff, attempt, domain, retry_after) * 1000)
+    logger.error(f"Giving up on {url} after {max_retries} attempts.")
+    return False
+
+async def robust_get(client, url, max_retries=3, backoff=2, headers=None, domain=None):
+    """HTTP counterpart of robust_goto. Returns the response, or None after the last failed attempt."""
+    for attempt in range(1, max_retries + 1):
+        retry_after = 0.0
+        started = time.perf_counter()
+        try:
+            logger.info(f"Fetching {url} (attempt {attempt})")
+            response = await client.get(url, headers=headers)
+            if domain:
+                domain.record(time.perf_counter() - started, status=response.status_code)
+            if response.status_code < 400:
+                return response
+            if response.status_code != 429 and response.status_code < 500:
+                logger.error(f"Giving up on {url}: HTTP {response.status_code}")
+                return None
+            logger.warning(f"Failed to fetch {url} (attempt {attempt}): HTTP {response.status_code}")
+            retry_after = retry_after_seconds(response.headers.get('retry-after'))
+        except Exception as e:
+            if domain:
+                domain.record(time.perf_counter() - started, error=e)
+            logger.warning(f"Failed to fetch {url} (attempt {attempt}): {e}")
+        if attempt < max_retries:
+            await asyncio.sleep(retry_delay(backoff, attempt, domain, retry_after))
+    logger.error(f"Giving up on {url} after {max_retries} attempts.")
+    return None
+
+def make_http_client():
+    """Pooled keep-alive client shared by every HTTP fast-path request in a run."""
+    return httpx.AsyncClient(
+        headers=HTTP_HEADERS,
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+    )
+
+def uses_http_fast_path(brand_conf):
+    return brand_conf.get('js_rendered') is False or bool(brand_conf.get('json_endpoint'))
+
+class NetworkTracker:
+    """Track in-flight requests on a page so waits can end once the network settles."""
+
+    def __init__(self, page):
+        self.inflight = 0
+        self.last_activity = time.monotonic()
+        self.page = page
+        page.on('request', self._started)
+        page.on('requestfinished', self._finished)
+        page.on('requestfailed', self._finished)
+
+    def detach(self):
+        """Stop listening, so a pooled page does not keep feeding a finished tracker."""
+        self.page.remove_listener('request', self._started)
+        self.page.remove_listener('requestfinished', self._finished)
+        self.page.remove_listener('requestfailed', self._finished)
+
+    def _started(self, request):
+        self.inflight += 1
+        self.last_activity = time.monotonic()
+
+    def _finished(self, request):
+        self.inflight = max(0, self.inflight - 1)
+        self.last_activity = time.monotonic()
+
+    def mark_activity(self):
+        """Restart the idle window, e.g. after a scroll or click whose requests have not been issued yet."""
+        self.last_activity = time.monotonic()
+
+    def is_idle(self, idle_ms=NETWORK_IDLE_WINDOW):
+        return (self.inflight <= NETWORK_IDLE_MAX_INFLIGHT
+                and (time.monotonic() - self.last_activity) * 1000 >= idle_ms)
+
+    async def wait_for_idle(self, page, timeout_ms):
+        """Wait until the network settles or ``timeout_ms`` passes. Returns True if it settled."""
+        deadline = time.monotonic() + timeout_ms / 1000
+        while not self.is_idle():
+            if time.monotonic() >= deadline:
                 return False
+            await page.wait_for_timeout(READINESS_POLL)
+        return True
+
+async def count_cards(page, selector):
+    try:
+        return await page.locator(selector).count()
+    except Exception:
+        return 0
+
+async def wait_for_card_growth(page, tracker, selector, previous, timeout_ms):
+    """Wait for more than ``previous`` cards to render after a scroll or click.
+
+    Gives up early once the network has been quiet for a full idle window
+    after the action, and at the latest after ``timeout_ms``. Returns the
+    current card count.
+    """
+    # The action's requests may not have started yet; quiet from before it says nothing
+    tracker.mark_activity()
+    deadline = time.monotonic() + timeout_ms / 1000
+    while True:
+        await page.wait_for_timeout(READINESS_POLL)
+        count = await count_cards(page, selector)
+        if count > previous or tracker.is_idle() or time.monotonic() >= deadline:
+            return count
+
+async def install_request_blocking(target, brand_conf):
+    """Abort requests for resource types and domains the scraper never reads.
+
+    ``target`` is a page or a browser context; both expose the same route API.
+    The brand's ``blocking`` entry is false to disable blocking, true (or
+    absent) for the default lists, or an object overriding ``resource_types``
+    and/or ``domains``.
+    """
+    blocking = brand_conf.get('blocking', True)
+    if blocking is False:
+        return
+    if blocking is True:
+        blocking = {}
+    elif not isinstance(blocking, dict):
+        raise ValueError(f"'blocking' must be true, false or an object with resource_types/domains, got {blocking!r}")
+    resource_types = set(blocking.get('resource_types', DEFAULT_BLOCKED_RESOURCE_TYPES))
+    domains = tuple(blocking.get('domains', DEFAULT_BLOCKED_DOMAINS))
+
+    async def handle(route):
+        request = route.request
+        host = urlparse(request.url).hostname or ''
+        if request.resource_type in resource_types or any(host == d or host.endswith('.' + d) for d in domains):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await target.route('**/*', handle)
+
+class _PooledContext:
+    def __init__(self, context):
+        self.context = context
+        self.navigations = 0
+        self.active = 0
+        self.idle_pages = []
+        self.retired = False
+        self.closed = False
+
+class PagePool:
+    """Browser contexts and pages reused across listing and product URLs.
+
+    Each brand gets its own context so its request blocking rules apply to
+    every page in it. A context is retired once its pages have made
+    ``max_navigations`` main-frame document loads (counted from the requests
+    themselves, so every goto, pagination click or redirect counts) or a page
+    comes back with a JS heap above ``max_heap_mb``; it is closed when its
+    last page is released and the next acquire opens a fresh one. One pool
+    can be shared by several brands scraping in the same browser.
+    """
+
+    def __init__(self, browser, max_navigations=CONTEXT_MAX_NAVIGATIONS, max_heap_mb=CONTEXT_MAX_HEAP_MB):
+        self.browser = browser
+        self.max_navigations = max_navigations
+        self.max_heap_bytes = max_heap_mb * 1024 * 1024
+        self._contexts = {}
+        self._retired = []  # Retired contexts that still have pages checked out
+        self._owners = {}
+        self._lock = asyncio.Lock()
+        self.stats = {'contexts_created': 0, 'contexts_recycled': 0, 'pages_created': 0, 'pages_reused': 0}
+
+    async def _context_for(self, brand_conf):
+        key = brand_conf['brand']
+        async with self._lock:
+            pooled = self._contexts.get(key)
+            if pooled is None or pooled.retired:
+                if pooled is not None and not pooled.closed:
+                    self._retired.append(pooled)
+                context = await self.browser.new_context()
+                await install_request_blocking(context, brand_conf)
+                pooled = self._contexts[key] = _PooledContext(context)
+                self.stats['contexts_created'] += 1
+            return pooled
+
+    def _count_navigation(self, pooled, page, request):
+        try:
+            if not request.is_navigation_request() or request.frame != page.main_frame:
+                return
+        except Exception:
+            return  # Service worker requests have no frame
+        pooled.navigations += 1
+        if pooled.navigations >= self.max_navigations:
+            pooled.retired = True
+
+    async def acquire(self, brand_conf):
+        pooled = await self._context_for(brand_conf)
+        pooled.active += 1
+        if pooled.idle_pages:
+            page = pooled.idle_pages.pop()
+            self.stats['pages_reused'] += 1
+        else:
+            try:
+                page = await pooled.context.new_page()
+            except Exception:
+                pooled.active -= 1
+                raise
+            page.on('request', lambda request, pooled=pooled, page=page: self._count_navigation(pooled, page, request))
+            self.stats['pages_created'] += 1
+        self._owners[page] = pooled
+        return page
+
+    async def release(self, page):
+        pooled = self._owners.pop(page)
+        pooled.active -= 1
+        reusable = not pooled.retired and not page.is_closed()
+        if reusable:
+            try:
+                heap = await page.evaluate('() => performance.memory ? performance.memory.usedJSHeapSize : 0')
+                if heap > self.max_heap_bytes:
+                    logger.info(f"Recycling browser context: page heap {heap / 1024 / 1024:.0f} MB over limit")
+                    pooled.retired = True
+                    reusable = False
+                else:
+                    # Drop the old document so an idle page holds no DOM or timers
+                    await page.goto('about:blank')
+            except Exception:
+                reusable = False
+        if reusable:
+            pooled.idle_pages.append(page)
+            return
+        if not page.is_closed():
+            await page.close()
+        if pooled.retired and pooled.active == 0:
+            await self._close_context(pooled)
+
+    async def _close_context(self, pooled):
+        if pooled.closed:
+            return
+        pooled.closed = True
+        if pooled in self._retired:
+            self._retired.remove(pooled)
+        for idle_page in pooled.idle_pages:
+            if not idle_page.is_closed():
+                await idle_page.close()
+        pooled.idle_pages = []
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser context: {e}")
+        self.stats['contexts_recycled'] += 1
+
+    @asynccontextmanager
+    async def page(self, brand_conf):
+        page = await self.acquire(brand_conf)
+        try:
+            yield page
+        finally:
+            await self.release(page)
+
+    async def close(self):
+        # Pages still checked out go down with their context, including retired ones
+        for pooled in list(self._contexts.values()) + list(self._retired):
+            pooled.retired = True
+            await self._close_context(pooled)
+        self._contexts = {}
+        self._retired = []
+        logger.info(f"Page pool stats: {self.stats}")
 
 def log_scrape_status(i, total, url, success=True):
     if success:
@@ -137,177 +700,828 @@ DISCLAIMER_TEXT = (
     "Disclaimer: Due to the difference in lighting used during photoshoots, the color or texture of the actual product may slightly vary from the image."
 )
 
-def save_to_sqlite(data, filename):
-    if not data:
-        logger.warning("No data to save to SQLite")
-        return
+def product_value(value):
+    # Numbers and NULLs keep their SQLite type; anything else is stored as text
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return str(value)
+
+@functools.lru_cache(maxsize=32)
+def upsert_sql(keys):
+    # Identical SQL text lets sqlite3 reuse the connection's prepared statement
+    quoted_keys = ', '.join([f'"{k}"' for k in keys])
+    placeholders = ', '.join(['?'] * len(keys))
+    updates = ', '.join([f'"{k}" = excluded."{k}"' for k in keys if k != 'url'])
+    return f'INSERT INTO products ({quoted_keys}) VALUES ({placeholders}) ON CONFLICT(url) DO UPDATE SET {updates}'
+
+def insert_products(conn, data):
+    """Upsert product rows by URL on an open connection; the caller owns the transaction.
+
+    URLs must already be normalized (the listing readers normalize them when
+    they are collected), so tracking parameters never split a product. A URL
+    that is already stored has its row updated in place. db.record_observations
+    appends price_history for moved prices and updates the daily rollups in one
+    pass over the batch; new rows reach products_fts on the next
+    db.sync_products_fts.
+    """
     filtered_data = []
     for row in data:
-        desc = row.get('description', '').strip()
+        desc = (row.get('description') or '').strip()
         if desc.startswith(DISCLAIMER_TEXT):
             logger.info("Skipping product with only disclaimer as description.")
             continue
         filtered_data.append(row)
     if not filtered_data:
         logger.warning("No valid data to save to SQLite after filtering disclaimers.")
+        return 0
+    scraped_at = datetime.utcnow().isoformat() + 'Z'
+    all_keys = sorted({k for d in filtered_data for k in d.keys()} | {'scraped_at'})
+    # Spec fields outside the declared schema get their own TEXT columns
+    db.ensure_product_columns(conn, [k for k in all_keys if k not in db.PRODUCT_COLUMNS])
+    sql = upsert_sql(tuple(all_keys))
+    rows = [[scraped_at if k == 'scraped_at' else product_value(row.get(k)) for k in all_keys] for row in filtered_data]
+    try:
+        conn.executemany(sql, rows)
+        inserted = len(rows)
+    except sqlite3.Error as e:
+        logger.warning(f"Batch insert into SQLite failed ({e}); retrying row by row")
+        # Upserts are idempotent, so rows the failed batch already wrote are simply written again
+        inserted = 0
+        for values in rows:
+            try:
+                conn.execute(sql, values)
+                inserted += 1
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to insert row into SQLite: {e}")
+    if 'url' in all_keys:
+        url_index = all_keys.index('url')
+        db.record_observations(conn, (values[url_index] for values in rows), scraped_at, price_history=True)
+    return inserted
+
+def save_to_sqlite(data, filename):
+    if not data:
+        logger.warning("No data to save to SQLite")
         return
-    conn = sqlite3.connect(filename)
-    c = conn.cursor()
-    # Dynamically create columns based on all keys
-    all_keys = sorted({k for d in filtered_data for k in d.keys()})
-    columns = ', '.join([f'"{k}" TEXT' for k in all_keys])
-    c.execute(f'CREATE TABLE IF NOT EXISTS products ({columns})')
-    # Add new columns if needed
-    existing_cols = set(row[1] for row in c.execute('PRAGMA table_info(products)').fetchall())
-    for k in all_keys:
-        if k not in existing_cols:
-            c.execute(f'ALTER TABLE products ADD COLUMN "{k}" TEXT')
-    for row in filtered_data:
-        placeholders = ', '.join(['?'] * len(all_keys))
-        values = [str(row.get(k, '')) for k in all_keys]
+    data = [{**row, 'url': normalize_url(row['url'])} if row.get('url') else row for row in data]
+    with db.writer(filename) as conn:
+        saved = insert_products(conn, data)
+        db.sync_products_fts(conn)
+    if saved:
+        logger.info(f"Data saved to SQLite database: {filename}")
+
+def load_frontier(filename, brand):
+    """Return {url: entry} for every product URL of ``brand`` seen by earlier runs."""
+    with db.reader(filename) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute('SELECT * FROM frontier WHERE brand = ?', (brand,)).fetchall()
+    return {row['url']: dict(row) for row in rows}
+
+def upsert_frontier(conn, brand, entries):
+    """Upsert (url, validators, changed) entries on an open connection.
+
+    Unchanged URLs only get their last_seen bumped, and count as an observation
+    of their stored product for the daily rollups; validators that could not be
+    collected this run keep their previous values.
+    """
+    now = datetime.utcnow().isoformat() + 'Z'
+    conn.executemany('''INSERT INTO frontier (url, brand, first_seen, last_seen, last_changed, content_hash, etag, last_modified)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            brand = excluded.brand,
+            last_seen = excluded.last_seen,
+            last_changed = COALESCE(excluded.last_changed, frontier.last_changed),
+            content_hash = COALESCE(excluded.content_hash, frontier.content_hash),
+            etag = COALESCE(excluded.etag, frontier.etag),
+            last_modified = COALESCE(excluded.last_modified, frontier.last_modified)''',
+        [(url, brand, now, now, now if changed else None,
+          (validators or {}).get('content_hash'), (validators or {}).get('etag'), (validators or {}).get('last_modified'))
+         for url, validators, changed in entries])
+    db.record_observations(conn, (url for url, _, changed in entries if not changed), now)
+
+def record_frontier(filename, brand, entries):
+    """Persist crawl results. ``entries`` holds (url, validators, changed) tuples."""
+    if not entries:
+        return
+    with db.writer(filename) as conn:
+        upsert_frontier(conn, brand, entries)
+
+class ScrapeRun:
+    """Checkpointed record of one brand crawl.
+
+    Outcomes are buffered and flushed every ``batch_size`` products in a single
+    transaction that inserts the product rows, upserts their frontier entries
+    and bumps the run counters, so an interrupted crawl keeps everything up to
+    its last checkpoint. New products reach the full-text index in bulk, at
+    most every FTS_SYNC_INTERVAL seconds and at the end of the run. With
+    ``resume`` the brand's latest unfinished run is reopened instead of
+    starting a new one. ``progress`` is called with the running counts after
+    every product.
+    """
+
+    def __init__(self, filename, brand, resume=False, batch_size=SAVE_BATCH_SIZE, progress=None):
+        self.filename = filename
+        self.brand = brand
+        self.batch_size = batch_size
+        self.progress = progress
+        self.rows = []
+        self.entries = []
+        self.failed_urls = []
+        self.pending_failed = 0
+        self.resumed = False
+        self.fts_synced_at = time.monotonic()
+        now = datetime.utcnow().isoformat() + 'Z'
+        with db.writer(filename) as conn:
+            conn.row_factory = sqlite3.Row
+            row = None
+            if resume:
+                row = conn.execute("SELECT * FROM scrape_runs WHERE brand = ? ORDER BY id DESC LIMIT 1", (brand,)).fetchone()
+                if row is not None and row['status'] == 'finished':
+                    row = None
+            if row is not None:
+                self.resumed = True
+                self.id = row['id']
+                self.started_at = row['started_at']
+                self.saved, self.unchanged, self.failed = row['saved'], row['unchanged'], row['failed']
+                conn.execute("UPDATE scrape_runs SET status = 'running', updated_at = ? WHERE id = ?", (now, self.id))
+            else:
+                self.started_at = now
+                self.saved = self.unchanged = self.failed = 0
+                self.id = conn.execute("INSERT INTO scrape_runs (brand, status, started_at, updated_at) VALUES (?, 'running', ?, ?)",
+                                       (brand, now, now)).lastrowid
+
+    def persisted_urls(self, frontier):
+        """URLs this run already checkpointed, judged by their frontier last_seen."""
+        if not self.resumed:
+            return set()
+        return {url for url, entry in frontier.items() if (entry.get('last_seen') or '') >= self.started_at}
+
+    def add(self, product_url, outcome, data, validators):
+        if outcome == 'failed':
+            self.failed_urls.append(product_url)
+            self.pending_failed += 1
+        else:
+            if outcome == 'scraped':
+                self.rows.append(data)
+            self.entries.append((product_url, validators, outcome == 'scraped'))
+        if len(self.entries) + self.pending_failed >= self.batch_size:
+            self.flush()
+        if self.progress:
+            self.progress({**self.counts(), 'url': product_url, 'outcome': outcome})
+
+    def counts(self):
+        """Run totals including outcomes still waiting for the next checkpoint."""
+        return {
+            'run_id': self.id,
+            'scraped': self.saved + len(self.rows),
+            'unchanged': self.unchanged + len(self.entries) - len(self.rows),
+            'failed': self.failed + self.pending_failed,
+        }
+
+    def flush(self, status=None):
+        now = datetime.utcnow().isoformat() + 'Z'
+        scraped = len(self.rows)
+        unchanged = len(self.entries) - scraped
+        # The shared writer keeps its prepared statements warm across checkpoints
+        with db.writer(self.filename) as conn:
+            if self.rows:
+                insert_products(conn, self.rows)
+            if self.entries:
+                upsert_frontier(conn, self.brand, self.entries)
+            if status is not None or time.monotonic() - self.fts_synced_at >= FTS_SYNC_INTERVAL:
+                db.sync_products_fts(conn)
+                self.fts_synced_at = time.monotonic()
+            conn.execute('''UPDATE scrape_runs SET saved = saved + ?, unchanged = unchanged + ?, failed = failed + ?,
+                updated_at = ?, status = COALESCE(?, status), finished_at = CASE WHEN ? IS NULL THEN finished_at ELSE ? END
+                WHERE id = ?''', (scraped, unchanged, self.pending_failed, now, status, status, now, self.id))
+        if scraped or unchanged:
+            logger.info(f"Checkpointed {scraped} new or changed and {unchanged} unchanged {self.brand} products (run {self.id})")
+        self.saved += scraped
+        self.unchanged += unchanged
+        self.failed += self.pending_failed
+        self.rows = []
+        self.entries = []
+        self.pending_failed = 0
+
+    def finish(self, status='finished'):
+        self.flush(status)
+
+def conditional_headers(entry):
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def frontier_validators(response, entry=None):
+    if response.status_code == 304:
+        entry = entry or {}
+        return {
+            'content_hash': entry.get('content_hash'),
+            'etag': response.headers.get('etag') or entry.get('etag'),
+            'last_modified': response.headers.get('last-modified') or entry.get('last_modified'),
+        }
+    return {
+        'content_hash': hashlib.sha256(response.content).hexdigest(),
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+    }
+
+def is_unchanged(response, entry, validators):
+    if not entry:
+        return False
+    if response.status_code == 304:
+        return True
+    return entry.get('content_hash') is not None and entry['content_hash'] == validators['content_hash']
+
+def fields_hash(data):
+    """Content hash of extracted product fields, for pages whose data is rendered client-side."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class DomainController:
+    """AIMD limit on concurrent requests and request spacing for one domain.
+
+    Concurrency starts at ``initial`` and grows by one slot per round of
+    ``limit`` healthy responses, up to ``ceiling``. A 429 or 5xx, a failed
+    load, or a response far slower than the best seen cuts it by
+    DOMAIN_DECREASE_FACTOR, at most once per round trip so one burst of
+    failures counts once. Throttling and errors also widen the spacing
+    between request starts, and successes narrow it again.
+    """
+
+    def __init__(self, domain, ceiling=DOMAIN_CONCURRENCY, initial=DOMAIN_INITIAL_CONCURRENCY):
+        self.domain = domain
+        self.ceiling = max(1, int(ceiling))
+        self.limit = float(max(1, min(self.ceiling, initial)))
+        self.delay = 0.0
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'slow': 0, 'increases': 0, 'decreases': 0}
+        self._waiters = deque()
+        self._next_start = 0.0
+        self._last_decrease = 0.0
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        while self.in_flight >= int(self.limit):
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    self._wake()
+                raise
+        self.in_flight += 1
+        try:
+            now = loop.time()
+            start = max(now, self._next_start)
+            self._next_start = start + self.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def record(self, latency, status=None, error=None):
+        """Feed one request outcome back into the limit."""
+        self.stats['requests'] += 1
+        reason = None
+        if error is not None:
+            self.stats['errors'] += 1
+            reason = type(error).__name__
+        elif status == 429 or (status is not None and status >= 500):
+            self.stats['throttled'] += 1
+            reason = f"HTTP {status}"
+        else:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+            if latency > max(DOMAIN_SLOW_FACTOR * self.best_latency, 1.0):
+                self.stats['slow'] += 1
+                reason = f"slow response {latency:.2f}s"
+        if reason:
+            self._decrease(reason, throttled=not reason.startswith('slow'))
+        else:
+            self._increase()
+
+    def _decrease(self, reason, throttled):
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or 1.0):
+            return
+        self._last_decrease = now
+        old_limit, old_delay = self.limit, self.delay
+        self.limit = max(1.0, self.limit * DOMAIN_DECREASE_FACTOR)
+        if throttled:
+            self.delay = min(DOMAIN_MAX_DELAY, max(DOMAIN_DELAY_STEP, self.delay * 2))
+        self.stats['decreases'] += 1
+        logger.info(f"{self.domain}: concurrency {old_limit:.1f} -> {self.limit:.1f}, "
+                    f"spacing {old_delay:.2f}s -> {self.delay:.2f}s ({reason})")
+
+    def _increase(self):
+        if self.delay:
+            self.delay = max(0.0, self.delay - DOMAIN_DELAY_STEP / self.limit)
+        if self.limit >= self.ceiling:
+            return
+        old_slots = int(self.limit)
+        self.limit = min(float(self.ceiling), self.limit + 1 / self.limit)
+        if int(self.limit) > old_slots:
+            self.stats['increases'] += 1
+            logger.info(f"{self.domain}: concurrency {old_slots} -> {int(self.limit)} "
+                        f"(latency {self.latency:.2f}s, ceiling {self.ceiling})")
+            self._wake()
+
+    def snapshot(self):
+        return {
+            'domain': self.domain,
+            'limit': int(self.limit),
+            'ceiling': self.ceiling,
+            'in_flight': self.in_flight,
+            'spacing_s': round(self.delay, 2),
+            'latency_ms': round(self.latency * 1000) if self.latency is not None else None,
+            'best_latency_ms': round(self.best_latency * 1000) if self.best_latency is not None else None,
+            **self.stats,
+        }
+
+def domain_controller(url, domain_limits, ceiling=DOMAIN_CONCURRENCY):
+    """Return the DomainController for the domain of ``url``.
+
+    ``domain_limits`` is shared by every brand scraped in the same run, so
+    brands hosted on the same site draw from one budget; the lowest ceiling
+    configured by any of them applies.
+    """
+    domain = urlparse(url).netloc
+    controller = domain_limits.get(domain)
+    if controller is None:
+        controller = domain_limits[domain] = DomainController(domain, ceiling)
+    elif int(ceiling) < controller.ceiling:
+        controller.ceiling = max(1, int(ceiling))
+        controller.limit = min(controller.limit, float(controller.ceiling))
+    return controller
+
+def log_domain_limits(domain_limits):
+    for controller in domain_limits.values():
+        logger.info(f"Domain limits: {controller.snapshot()}")
+
+def log_unchanged(i, total, url):
+    logger.info(f"Unchanged product {i+1}/{total} from {url}")
+
+async def scrape_product(page_pool, product_url, brand_conf, i, total, semaphore, domain_limits, frontier_entry=None, full=False):
+    """Fetch and extract one product page, holding a worker slot while it runs.
+
+    Rendered pages can change client-side (price, stock) without the server
+    HTML or its validators changing, so the page is always rendered and the
+    product counts as unchanged only when its extracted fields hash the same
+    as in ``frontier_entry``; that saves the database write, not the render.
+    ``full`` reports every product as scraped.
+
+    Returns (outcome, data, validators) where outcome is 'scraped',
+    'unchanged' or 'failed'.
+    """
+    domain_limit = brand_conf.get('domain_concurrency', DOMAIN_CONCURRENCY)
+    async with semaphore, domain_controller(product_url, domain_limits, domain_limit) as domain:
+        try:
+            async with page_pool.page(brand_conf) as prod_page:
+                loaded = await robust_goto(prod_page, product_url, domain=domain)
+                if not loaded:
+                    log_scrape_status(i, total, product_url, success=False)
+                    return 'failed', None, None
+                try:
+                    data = await extract_fields_from_product_page(prod_page, brand_conf['product_page'])
+                    data['url'] = product_url
+                    data['brand'] = brand_conf['brand']
+                    log_scrape_status(i, total, product_url, success=True)
+                except Exception as e:
+                    logger.warning(f"Failed to extract fields for {product_url}: {e}")
+                    log_scrape_status(i, total, product_url, success=False)
+                    data = None
+            if data is None:
+                return 'failed', None, None
+            validators = {'content_hash': fields_hash(data), 'etag': None, 'last_modified': None}
+            if not full and frontier_entry and frontier_entry.get('content_hash') == validators['content_hash']:
+                log_unchanged(i, total, product_url)
+                return 'unchanged', None, validators
+            return 'scraped', data, validators
+        except Exception as e:
+            logger.warning(f"Failed to scrape product {product_url}: {e}")
+            log_scrape_status(i, total, product_url, success=False)
+            return 'failed', None, None
+
+async def scrape_product_http(client, product_url, brand_conf, i, total, semaphore, domain_limits, frontier_entry=None, full=False):
+    """HTTP fast-path counterpart of scrape_product, using the frontier validators as conditional request headers."""
+    domain_limit = brand_conf.get('domain_concurrency', DOMAIN_CONCURRENCY)
+    json_endpoint = brand_conf.get('json_endpoint')
+    fetch_url = json_endpoint.format(url=product_url.split('?')[0]) if json_endpoint else product_url
+    headers = None if full else conditional_headers(frontier_entry)
+    async with semaphore, domain_controller(product_url, domain_limits, domain_limit) as domain:
+        response = await robust_get(client, fetch_url, headers=headers, domain=domain)
+    if response is None:
+        log_scrape_status(i, total, product_url, success=False)
+        return 'failed', None, None
+    validators = frontier_validators(response, frontier_entry)
+    if not full and is_unchanged(response, frontier_entry, validators):
+        log_unchanged(i, total, product_url)
+        return 'unchanged', None, validators
+    try:
+        if json_endpoint:
+            data = await run_parser(extract_fields_from_product_json, response.json(), product_url, brand_conf['product_page'])
+        else:
+            data = await run_parser(extract_fields_from_html, response.text, product_url, brand_conf['product_page'])
+        data['url'] = product_url
+        data['brand'] = brand_conf['brand']
+        log_scrape_status(i, total, product_url, success=True)
+        return 'scraped', data, validators
+    except Exception as e:
+        logger.warning(f"Failed to extract fields for {product_url}: {e}")
+        log_scrape_status(i, total, product_url, success=False)
+        return 'failed', None, None
+
+# Reads every card's product link in one round trip
+LISTING_LINKS_SCRIPT = """(els, attr) => els.map((el) => {
+    if (attr === 'parent_a_href') {
+        const a = el.closest('a');
+        return a ? a.href : null;
+    }
+    return el.getAttribute(attr || 'href');
+})"""
+
+def listing_page_url(base_url, page_number, param='page'):
+    parts = urlparse(base_url)
+    query = dict(parse_qsl(parts.query))
+    query[param] = str(page_number)
+    return parts._replace(query=urlencode(query)).geturl()
+
+def pagination_steps(pagination):
+    """Maximum number of times a listing may be advanced beyond its first load."""
+    kind = pagination.get('type', 'scroll')
+    if kind == 'load_more':
+        return pagination.get('max_clicks', SCROLL_COUNT)
+    if kind == 'page':
+        return pagination.get('max_pages', SCROLL_COUNT + 1) - 1
+    return pagination.get('max_scrolls', SCROLL_COUNT)
+
+async def read_listing_urls(page, selector, product_link_attribute, base_url):
+    hrefs = await page.eval_on_selector_all(selector, LISTING_LINKS_SCRIPT, product_link_attribute)
+    return [normalize_url(urljoin(base_url, href)) for href in hrefs if href]
+
+async def wait_for_listing(page, tracker, base_url, product_card_selector):
+    """Wait for the first cards and for the network to settle after a listing navigation."""
+    try:
+        await page.wait_for_selector(product_card_selector, timeout=SELECTOR_WAIT)
+    except Exception:
+        logger.warning(f"Timeout waiting for selector '{product_card_selector}' on {base_url}")
+    return await tracker.wait_for_idle(page, DYNAMIC_WAIT)
+
+async def choose_card_selector(page, product_card_selector, base_url):
+    for selector in [product_card_selector] + FALLBACK_SELECTORS:
+        found = await count_cards(page, selector)
+        if found:
+            logger.info(f"Using selector '{selector}' found {found} cards on {base_url}")
+            return selector
+        logger.warning(f"No product cards found for selector '{selector}' on {base_url}")
+    logger.error(f"No product cards found for any selector on {base_url}")
+    return None
+
+async def advance_listing(page, tracker, base_url, selector, pagination, step, domain=None):
+    """Load the next chunk of a listing according to its pagination type. Returns False when exhausted."""
+    kind = pagination.get('type', 'scroll')
+    if kind == 'page':
+        url = listing_page_url(base_url, step + 1, pagination.get('param', 'page'))
+        if not await robust_goto(page, url, domain=domain):
+            return False
+        await wait_for_listing(page, tracker, url, selector)
+        return True
+    before = await count_cards(page, selector)
+    if kind == 'load_more':
+        button = await page.query_selector(pagination['button_selector'])
+        if not button or not await button.is_visible():
+            return False
+        await button.click()
+    else:
+        await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+    return await wait_for_card_growth(page, tracker, selector, before, SCROLL_WAIT + EXTRA_SCROLL_WAIT) > before
+
+async def iter_listing_urls(page_pool, base_url, brand_conf, domain_limits):
+    """Yield batches of new product URLs from one listing, paginating only when asked for more.
+
+    Yields None once if the listing could not be loaded. The caller stops
+    pagination by closing the generator as soon as it has enough URLs.
+    """
+    domain_limit = brand_conf.get('domain_concurrency', DOMAIN_CONCURRENCY)
+    product_listing = brand_conf['product_listing']
+    product_link_attribute = product_listing['product_link_attribute']
+    pagination = brand_conf.get('pagination', {})
+    async with page_pool.page(brand_conf) as page:
+        tracker = NetworkTracker(page)
+        started = time.perf_counter()
+        steps = 0
         try:
-            c.execute(f'INSERT INTO products ({', '.join([f'"{k}"' for k in all_keys])}) VALUES ({placeholders})', values)
+            async with domain_controller(base_url, domain_limits, domain_limit) as domain:
+                loaded = await robust_goto(page, base_url, domain=domain)
+            if not loaded:
+                yield None
+                return
+            loaded_at = time.perf_counter()
+            settled = await wait_for_listing(page, tracker, base_url, product_listing['product_card_selector'])
+            logger.info(f"Listing ready on {base_url} in {time.perf_counter() - started:.2f}s "
+                        f"(load {loaded_at - started:.2f}s, ready {time.perf_counter() - loaded_at:.2f}s"
+                        f"{'' if settled else ', network still busy'})")
+            selector = await choose_card_selector(page, product_listing['product_card_selector'], base_url)
+            if not selector:
+                return
+            seen = set()
+            max_steps = pagination_steps(pagination)
+            while True:
+                batch = [url for url in await read_listing_urls(page, selector, product_link_attribute, base_url)
+                         if url not in seen]
+                seen.update(batch)
+                if batch:
+                    yield batch
+                elif steps:
+                    break
+                if steps >= max_steps:
+                    break
+                steps += 1
+                async with domain_controller(base_url, domain_limits, domain_limit) as domain:
+                    advanced = await advance_listing(page, tracker, base_url, selector, pagination, steps, domain)
+                if not advanced:
+                    break
         except Exception as e:
-            logger.warning(f"Failed to insert row into SQLite: {e}")
-    conn.commit()
-    conn.close()
-    logger.info(f"Data saved to SQLite database: {filename}")
+            logger.error(f"Error collecting product URLs for {brand_conf['brand']}: {e}")
+        finally:
+            tracker.detach()
+            logger.info(f"Listing {base_url} paged {steps} times ({pagination.get('type', 'scroll')}) "
+                        f"in {time.perf_counter() - started:.2f}s")
 
-async def scrape_brand(brand_name, config, browser, max_products=50):
+def extract_listing_urls_from_html(html, base_url, product_listing):
+    soup = BeautifulSoup(html, 'lxml')
+    product_link_attribute = product_listing['product_link_attribute']
+    selectors_to_try = [product_listing['product_card_selector']] + FALLBACK_SELECTORS
+    cards = []
+    for selector in selectors_to_try:
+        cards = soup.select(selector)
+        if cards:
+            logger.info(f"Using selector '{selector}' found {len(cards)} cards on {base_url}")
+            break
+        else:
+            logger.warning(f"No product cards found for selector '{selector}' on {base_url}")
+    if not cards:
+        logger.error(f"No product cards found for any selector on {base_url}")
+    product_urls = []
+    for card in cards:
+        if product_link_attribute == 'parent_a_href':
+            anchor = card if card.name == 'a' else card.find_parent('a')
+            href = anchor.get('href') if anchor else None
+        else:
+            href = card.get(product_link_attribute or 'href')
+        if href:
+            href = normalize_url(urljoin(base_url, href))
+            if href not in product_urls:
+                product_urls.append(href)
+    return product_urls
+
+async def iter_listing_urls_http(client, base_url, brand_conf, domain_limits):
+    """HTTP fast-path counterpart of iter_listing_urls; only "page" pagination applies to static HTML."""
+    domain_limit = brand_conf.get('domain_concurrency', DOMAIN_CONCURRENCY)
+    pagination = brand_conf.get('pagination', {})
+    max_steps = pagination_steps(pagination) if pagination.get('type') == 'page' else 0
+    seen = set()
+    for step in range(max_steps + 1):
+        url = base_url if step == 0 else listing_page_url(base_url, step + 1, pagination.get('param', 'page'))
+        started = time.perf_counter()
+        async with domain_controller(base_url, domain_limits, domain_limit) as domain:
+            response = await robust_get(client, url, domain=domain)
+        if response is None:
+            if step == 0:
+                yield None
+            return
+        logger.info(f"Listing fetched from {url} in {time.perf_counter() - started:.2f}s")
+        listing_urls = await run_parser(extract_listing_urls_from_html, response.text, base_url, brand_conf['product_listing'])
+        batch = [u for u in listing_urls if u not in seen]
+        if not batch:
+            return
+        seen.update(batch)
+        yield batch
+
+async def scrape_brand(brand_name, config, browser, max_products=50, concurrency=None, domain_limits=None,
+                       http_client=None, full=False, page_pool=None, resume=False, progress=None):
+    """Scrape up to ``max_products`` products of one brand and save new or changed rows.
+
+    Products unchanged since the last run (per the frontier table) count
+    towards ``max_products`` but, unless ``full`` is set, are not re-extracted
+    on the HTTP fast path (conditional requests) and not re-saved on the
+    browser path (same extracted fields). Browser pages come from
+    ``page_pool``; pass one to share contexts with other brands, otherwise a
+    pool is opened for this call.
+
+    Rows are checkpointed to SQLite as they complete (see ScrapeRun) rather
+    than held until the end. With ``resume`` the brand's last unfinished run
+    is continued and the products it already persisted are skipped.
+    ``progress`` receives per-product counts (see ScrapeRun). Returns
+    (saved, failed_urls) where ``saved`` counts the new or changed rows of
+    the run.
+    """
     brand_conf = config[brand_name]
+    fast_path = uses_http_fast_path(brand_conf)
+    if http_client is None:
+        async with make_http_client() as client:
+            return await scrape_brand(brand_name, config, browser, max_products, concurrency, domain_limits,
+                                      http_client=client, full=full, page_pool=page_pool, resume=resume, progress=progress)
+    if page_pool is None and not fast_path:
+        page_pool = PagePool(browser)
+        try:
+            return await scrape_brand(brand_name, config, browser, max_products, concurrency, domain_limits,
+                                      http_client=http_client, full=full, page_pool=page_pool, resume=resume, progress=progress)
+        finally:
+            await page_pool.close()
+    if domain_limits is None:
+        domain_limits = {}
+    # An explicit concurrency argument wins; the brand config only replaces the default
+    concurrency = concurrency or brand_conf.get('concurrency', PRODUCT_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    logger.info(f"Scraping {brand_conf['brand']} with {concurrency} concurrent product pages"
+                f"{' over plain HTTP' if fast_path else ''}{' (full recrawl)' if full else ''}")
+    frontier = load_frontier(DB_FILE, brand_conf['brand'])
+    run = ScrapeRun(DB_FILE, brand_conf['brand'], resume=resume, progress=progress)
+    persisted = run.persisted_urls(frontier)
+    if run.resumed:
+        logger.info(f"Resuming run {run.id} for {brand_conf['brand']} from {run.started_at}: "
+                    f"{len(persisted)} products already persisted.")
     base_urls = brand_conf['base_url']
     if isinstance(base_urls, str):
         base_urls = [base_urls]
-    scraped_data = []
-    failed_urls = []
-    for base_url in base_urls:
-        if len(scraped_data) >= max_products:
-            break
-        page = await browser.new_page()
-        loaded = await robust_goto(page, base_url)
-        if not loaded:
-            failed_urls.append(base_url)
-            await page.close()
-            continue
-        product_listing = brand_conf['product_listing']
-        product_card_selector = product_listing['product_card_selector']
-        product_link_attribute = product_listing['product_link_attribute']
-        try:
-            # Unified scroll logic
-            if brand_name in ['khaadi', 'outfitters', 'breakout']:
-                for _ in range(SCROLL_COUNT):
-                    await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                    await page.wait_for_timeout(SCROLL_WAIT)
-                    await page.wait_for_timeout(EXTRA_SCROLL_WAIT)  # Extra 1 second wait
-            try:
-                await page.wait_for_selector(product_card_selector, timeout=SELECTOR_WAIT)
-            except Exception:
-                logger.warning(f"Timeout waiting for selector '{product_card_selector}' on {base_url}")
-            await page.wait_for_timeout(DYNAMIC_WAIT)
-            selectors_to_try = [product_card_selector] + FALLBACK_SELECTORS
-            cards = []
-            for selector in selectors_to_try:
-                cards = await page.query_selector_all(selector)
-                if cards:
-                    logger.info(f"Using selector '{selector}' found {len(cards)} cards on {base_url}")
-                    break
-                else:
-                    logger.warning(f"No product cards found for selector '{selector}' on {base_url}")
-            if not cards:
-                logger.error(f"No product cards found for any selector on {base_url}")
-            product_urls = set()
-            for card in cards:
-                try:
-                    if product_link_attribute == 'parent_a_href':
-                        parent_a = await card.evaluate_handle('el => el.closest("a")')
-                        if parent_a:
-                            href = await parent_a.get_property('href')
-                            href_val = await href.json_value() if href else None
-                            if href_val:
-                                product_urls.add(href_val)
-                    else:
-                        href = await card.get_attribute(product_link_attribute) if product_link_attribute else await card.get_attribute('href')
-                        if href:
-                            if href.startswith('http'):
-                                product_urls.add(href)
+    # Products handled by this call that count towards max_products (failures do not)
+    done = 0
+    seen_urls = set()
+    pending = deque()
+
+    def drain():
+        # Hand finished results to the run in discovery order so checkpoints keep the listing ordering
+        nonlocal done
+        while pending and pending[0][1].done():
+            product_url, task = pending.popleft()
+            outcome, data, validators = task.result()
+            run.add(product_url, outcome, data, validators)
+            if outcome != 'failed':
+                done += 1
+
+    try:
+        for base_url in base_urls:
+            remaining = max_products - done
+            if remaining <= 0:
+                break
+            if fast_path:
+                listing = iter_listing_urls_http(http_client, base_url, brand_conf, domain_limits)
+            else:
+                listing = iter_listing_urls(page_pool, base_url, brand_conf, domain_limits)
+            queued = 0
+            # Products start scraping as soon as their URLs stream in; the listing stops paginating once enough are queued
+            async with aclosing(listing):
+                async for batch in listing:
+                    if batch is None:
+                        run.failed_urls.append(base_url)
+                        break
+                    for product_url in batch:
+                        if product_url in seen_urls:
+                            continue
+                        seen_urls.add(product_url)
+                        if product_url in persisted:
+                            done += 1
+                            remaining -= 1
+                        else:
+                            i = queued
+                            queued += 1
+                            if fast_path:
+                                task = scrape_product_http(http_client, product_url, brand_conf, i, remaining, semaphore, domain_limits,
+                                                           frontier.get(product_url), full)
                             else:
-                                from urllib.parse import urljoin
-                                product_urls.add(urljoin(base_url, href))
-                except Exception as e:
-                    logger.warning(f"Error extracting product URL: {e}")
-            # Only scrape up to the remaining needed products
-            remaining = max_products - len(scraped_data)
-            product_urls = list(product_urls)[:remaining]
-            logger.info(f"Collected {len(product_urls)} unique product URLs on {base_url} (remaining needed: {remaining}).")
-            for i, product_url in enumerate(product_urls):
-                try:
-                    prod_page = await browser.new_page()
-                    loaded = await robust_goto(prod_page, product_url)
-                    if not loaded:
-                        failed_urls.append(product_url)
-                        await prod_page.close()
-                        log_scrape_status(i, len(product_urls), product_url, success=False)
-                        continue
-                    try:
-                        data = await extract_fields_from_product_page(prod_page, brand_conf['product_page'])
-                        data['url'] = product_url
-                        data['brand'] = brand_conf['brand']
-                        scraped_data.append(data)
-                        log_scrape_status(i, len(product_urls), product_url, success=True)
-                    except Exception as e:
-                        logger.warning(f"Failed to extract fields for {product_url}: {e}")
-                        failed_urls.append(product_url)
-                        log_scrape_status(i, len(product_urls), product_url, success=False)
-                    await prod_page.close()
-                except Exception as e:
-                    logger.warning(f"Failed to scrape product {product_url}: {e}")
-                    failed_urls.append(product_url)
-                    log_scrape_status(i, len(product_urls), product_url, success=False)
-            await page.close()
-        except Exception as e:
-            logger.error(f"Error collecting product URLs for {brand_conf['brand']}: {e}")
-            await page.close()
-    if scraped_data:
-        save_to_sqlite(scraped_data, 'products_data.db')
-    return scraped_data, failed_urls
+                                task = scrape_product(page_pool, product_url, brand_conf, i, remaining, semaphore, domain_limits,
+                                                      frontier.get(product_url), full)
+                            pending.append((product_url, asyncio.create_task(task)))
+                        if queued >= remaining:
+                            break
+                    drain()
+                    if queued >= remaining:
+                        break
+            logger.info(f"Collected {queued} unique product URLs on {base_url} (remaining needed: {remaining}).")
+            while pending:
+                await asyncio.wait([pending[0][1]])
+                drain()
+        run.finish()
+    except BaseException:
+        for _, task in pending:
+            task.cancel()
+        run.finish('interrupted')
+        raise
+    logger.info(f"{brand_conf['brand']}: {run.saved} new or changed products, {run.unchanged} unchanged (run {run.id}).")
+    log_domain_limits(domain_limits)
+    return run.saved, run.failed_urls
+
+async def scrape_brands(brand_names, config, browser, max_products=50, concurrency=None, full=False, resume=False):
+    """Scrape several brands in parallel inside one browser, sharing one PagePool.
+
+    Returns a summary dict keyed by brand name with the product count and
+    failed URLs of each brand. A brand that crashes is reported with an
+    ``error`` entry instead of aborting the others.
+    """
+    domain_limits = {}
+    page_pool = PagePool(browser) if browser else None
+    try:
+        async with make_http_client() as http_client:
+            results = await asyncio.gather(*[
+                scrape_brand(brand_name, config, browser, max_products=max_products, concurrency=concurrency,
+                             domain_limits=domain_limits, http_client=http_client, full=full, page_pool=page_pool,
+                             resume=resume)
+                for brand_name in brand_names
+            ], return_exceptions=True)
+    finally:
+        if page_pool:
+            await page_pool.close()
+    summary = {}
+    for brand_name, result in zip(brand_names, results):
+        if isinstance(result, Exception):
+            logger.error(f"Scrape failed for {brand_name}: {result}")
+            summary[brand_name] = {"count": 0, "failed_urls": [], "error": str(result)}
+        else:
+            saved, failed_urls = result
+            summary[brand_name] = {"count": saved, "failed_urls": failed_urls}
+    return summary
 
 async def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--brand', type=str, help='Brand name to scrape')
+    parser.add_argument('--brands', type=str, help='Comma-separated brand names to scrape in parallel')
+    parser.add_argument('--all', action='store_true', help='Scrape every brand in the config in parallel')
     parser.add_argument('--count', type=int, default=50, help='Number of products to fetch')
+    parser.add_argument('--full', action='store_true', help='Re-extract every product even if the frontier says it is unchanged')
+    parser.add_argument('--resume', action='store_true', help='Continue the last interrupted run, skipping products it already saved')
+    parser.add_argument('--concurrency', type=int, help=f'Product pages to scrape at once (overrides brand config "concurrency"; default {PRODUCT_CONCURRENCY})')
     args = parser.parse_args()
     config = load_config()
     print("Available brands:", ', '.join(config.keys()))
-    brand_name = args.brand
-    if brand_name:
-        brand_name = brand_name.strip().lower().replace(' ', '_')
-    if not brand_name:
-        brand_name = input("Enter brand name to scrape: ").strip().lower().replace(' ', '_')
-    if brand_name not in config:
-        print(f"Brand '{brand_name}' not found in config.")
+    if args.all:
+        brand_names = list(config.keys())
+    elif args.brands:
+        brand_names = [normalize_brand_name(b) for b in args.brands.split(',') if b.strip()]
+    else:
+        brand_name = args.brand
+        if not brand_name:
+            brand_name = input("Enter brand name to scrape: ")
+        brand_names = [normalize_brand_name(brand_name)]
+    unknown = ', '.join(b for b in brand_names if b not in config)
+    if unknown:
+        print(f"Brand '{unknown}' not found in config.")
         return
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True, args=[
-            '--no-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-gpu',
-            '--disable-web-security',
-            '--disable-features=VizDisplayCompositor',
-            '--disable-background-timer-throttling',
-            '--disable-backgrounding-occluded-windows',
-            '--disable-renderer-backgrounding'
-        ])
-        data, failed_urls = await scrape_brand(brand_name, config, browser, max_products=args.count)
-        logger.info(f"Total products scraped: {len(data)}")
-        print(f"Total products scraped: {len(data)}")
-        # Write scrape status for UI
-        with open("scrape_status.json", "w") as f:
-            json.dump({"brand": brand_name, "count": len(data), "finished": True, "timestamp": datetime.utcnow().isoformat() + 'Z'}, f)
+        # Brands on the HTTP fast path never touch the browser, so skip the launch when none needs it
+        browser = None
+        if any(not uses_http_fast_path(config[b]) for b in brand_names):
+            browser = await p.chromium.launch(headless=True, args=BROWSER_ARGS)
+        if len(brand_names) == 1:
+            brand_name = brand_names[0]
+            saved, failed_urls = await scrape_brand(brand_name, config, browser, max_products=args.count, concurrency=args.concurrency,
+                                                    full=args.full, resume=args.resume)
+            logger.info(f"Total products scraped: {saved}")
+            print(f"Total products scraped: {saved}")
+        else:
+            summary = await scrape_brands(brand_names, config, browser, max_products=args.count, concurrency=args.concurrency,
+                                          full=args.full, resume=args.resume)
+            total = sum(s['count'] for s in summary.values())
+            for brand_name, brand_summary in summary.items():
+                print(f"{brand_name}: {brand_summary['count']} products, {len(brand_summary['failed_urls'])} failed")
+                for url in brand_summary['failed_urls']:
+                    print(f"  failed: {url}")
+            logger.info(f"Total products scraped: {total}")
+            print(f"Total products scraped: {total}")
+            failed_urls = [url for s in summary.values() for url in s['failed_urls']]
         if failed_urls:
             logger.error(f"Failed URLs ({len(failed_urls)}):\n" + '\n'.join(failed_urls))
         else:
             logger.info("All URLs scraped successfully.")
-        await browser.close()
+        if browser:
+            await browser.close()
+    close_parse_pool()
 
 if __name__ == "__main__":
     asyncio.run(main())
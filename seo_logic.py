@@ -3,9 +3,13 @@ nltk.download('punkt')
 nltk.download('stopwords')
 nltk.download('punkt_tab')
 
+import os
 import re
 import string
+import hashlib
+import random
 from collections import Counter
+from functools import cached_property, lru_cache
 import textstat
 import nltk
 from nltk.corpus import stopwords
@@ -13,23 +17,126 @@ from nltk.tokenize import word_tokenize
 
 stop_words = set(stopwords.words('english'))
 
+# 'legacy' counts every occurrence of every word of every keyword; 'phrase' counts whole keyword phrases
+DENSITY_MODES = ('legacy', 'phrase')
+DENSITY_MODE = os.getenv('SEO_DENSITY_MODE', 'legacy').strip().lower()
+
 def tokenize(text):
     return [w.lower() for w in word_tokenize(text) if w.isalnum()]
 
+class AnalyzedDoc:
+    """Everything the scorers read from one description, each part computed at most once.
+
+    Tokens, the lowercased text, the sentence split and the Flesch score are
+    worked out on first use and shared by every scorer, so seo_scores
+    tokenizes a description twice (whole text and per sentence) instead of
+    seven times. Every scorer accepts a plain description or an AnalyzedDoc.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    @cached_property
+    def tokens(self):
+        return tokenize(self.text)
+
+    @cached_property
+    def token_counts(self):
+        return Counter(self.tokens)
+
+    @cached_property
+    def content_tokens(self):
+        return frozenset(w for w in self.tokens if w not in stop_words)
+
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+
+    @cached_property
+    def sentences(self):
+        return re.split(r'[.!?]', self.text)
+
+    @cached_property
+    def sentence_lengths(self):
+        # Token counts of the non-blank sentences, tokenized on their own like the scorers always did
+        return [len(tokenize(s)) for s in self.sentences if s.strip()]
+
+    @cached_property
+    def flesch(self):
+        try:
+            return textstat.flesch_reading_ease(self.text)
+        except Exception:
+            return None
+
+def analyze(description):
+    return description if isinstance(description, AnalyzedDoc) else AnalyzedDoc(description)
+
 def count_occurrences(keywords, text_tokens):
+    counts = text_tokens if isinstance(text_tokens, Counter) else Counter(text_tokens)
     count = 0
     for kw in keywords:
         for word in kw.split():
-            count += text_tokens.count(word)
+            count += counts[word]
     return count
 
+class KeywordMatcher:
+    """Token trie over a brand's keyword phrases, matched in one pass over a description's tokens.
+
+    Keywords are tokenized like descriptions. Scanning left to right, the
+    longest phrase starting at each position is a hit and the scan resumes
+    after it, so "floral embroidered kurta" counts once, not as a "kurta"
+    hit too. A single-word keyword is a one-token phrase.
+    """
+
+    def __init__(self, keywords):
+        self.trie = {}
+        for keyword in keywords:
+            words = tokenize(keyword)
+            if not words:
+                continue
+            node = self.trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[None] = len(words)  # Phrase ends here
+
+    def count(self, tokens):
+        """``(hits, keyword_tokens)``: phrases matched and the tokens they cover."""
+        hits = covered = i = 0
+        while i < len(tokens):
+            node, length = self.trie, 0
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                length = node.get(None, length)
+            if length:
+                hits += 1
+                covered += length
+                i += length
+            else:
+                i += 1
+        return hits, covered
+
+@lru_cache(maxsize=256)
+def keyword_matcher(keywords):
+    """Compiled KeywordMatcher for a tuple of keywords, rebuilt only when the brand's keyword list changes."""
+    return KeywordMatcher(keywords)
+
 # 1. Keyword Density Score
-def keyword_density_score(description, brand, keyword_map):
+def keyword_density_score(description, brand, keyword_map, density_mode=None):
+    """Score keyword density; ``density_mode`` is 'legacy' or 'phrase' (default DENSITY_MODE)."""
+    density_mode = density_mode or DENSITY_MODE
+    if density_mode not in DENSITY_MODES:
+        raise ValueError(f"Unknown density mode {density_mode!r}; expected one of {', '.join(DENSITY_MODES)}")
     brand = brand.strip().title()  # Normalize brand name
-    text_tokens = tokenize(description)
-    total_words = len(text_tokens)
-    brand_keywords = [kw.lower() for kw in keyword_map.get(brand, [])]
-    keyword_count = count_occurrences(brand_keywords, text_tokens)
+    doc = analyze(description)
+    total_words = len(doc.tokens)
+    if density_mode == 'phrase':
+        # Share of the description's words that belong to a whole keyword phrase
+        keyword_count = keyword_matcher(tuple(keyword_map.get(brand, []))).count(doc.tokens)[1]
+    else:
+        brand_keywords = [kw.lower() for kw in keyword_map.get(brand, [])]
+        keyword_count = count_occurrences(brand_keywords, doc.token_counts)
     if total_words == 0:
         return 0
     if keyword_count == 0:
@@ -53,20 +160,19 @@ def keyword_density_score(description, brand, keyword_map):
 
 
 def content_quality_score(description):
-    text = description
-    tokens = tokenize(text)
+    doc = analyze(description)
+    text = doc.text
+    tokens = doc.tokens
     word_count = len(tokens)
     length_score = 20 if 50 <= word_count <= 150 else 0
-    sentences = re.split(r'[.!?]', text)
-    sentence_lengths = [len(tokenize(s)) for s in sentences if s.strip()]
-    varied_sentence = 15 if len(set(sentence_lengths)) > 1 else 0
+    varied_sentence = 15 if len(set(doc.sentence_lengths)) > 1 else 0
     adjectives = ["elegant", "luxurious", "vibrant", "classic", "modern", "trendy"]
-    rich_adj = 15 if any(adj in text.lower() for adj in adjectives) else 0
+    rich_adj = 15 if any(adj in doc.lower for adj in adjectives) else 0
     technical_terms = ["cambric fabric", "jacquard", "chiffon", "lawn", "cotton"]
-    technical = 10 if any(term in text.lower() for term in technical_terms) else 0
+    technical = 10 if any(term in doc.lower for term in technical_terms) else 0
     cta_phrases = ["shop now", "order today", "don't miss", "grab yours"]
-    cta = 10 if any(phrase in text.lower() for phrase in cta_phrases) else 0
-    redundancy = 10 if len(set(tokens)) / (len(tokens) + 1e-5) > 0.7 else 0
+    cta = 10 if any(phrase in doc.lower for phrase in cta_phrases) else 0
+    redundancy = 10 if len(doc.token_counts) / (len(tokens) + 1e-5) > 0.7 else 0
     grammar = 20 if "." in text and not re.search(r'(.)\1\1', text) else 10
     return min(length_score + varied_sentence + rich_adj + technical + cta + redundancy + grammar, 100)
 
@@ -80,7 +186,7 @@ def brand_consistency_score(description, brand):
         "Alkaram Studio": ["cotton", "cambric", "2-piece", "ethnic wear", "printed"],
         "Breakout": ["urban", "denim", "minimalist", "street style"]
     }
-    text = description.lower()
+    text = analyze(description).lower
     must_have = brand_keywords.get(brand, [])
     matches = sum(1 for kw in must_have if kw in text)
     if not must_have:
@@ -88,59 +194,180 @@ def brand_consistency_score(description, brand):
     return int((matches / len(must_have)) * 100)
 
 # 6. Uniqueness Score (Jaccard Similarity with NLTK)
-def uniqueness_score(description, brand, all_descriptions=None):
-    if not all_descriptions:
-        return 100
-    desc_tokens = set([w for w in tokenize(description) if w not in stop_words])
-    similarities = []
-    for other in all_descriptions:
-        if other == description:
-            continue
-        other_tokens = set([w for w in tokenize(other) if w not in stop_words])
-        intersection = desc_tokens & other_tokens
-        union = desc_tokens | other_tokens
-        sim = len(intersection) / (len(union) + 1e-5)
-        similarities.append(sim)
-    if not similarities:
-        return 100
-    max_sim = max(similarities)
+UNIQUENESS_LSH_MIN_CORPUS = 500  # Distinct token sets from which UniquenessIndex switches from all pairs to LSH
+MINHASH_PERMUTATIONS = 192
+# 3 rows per band put the LSH threshold at (1/64)^(1/3) = 0.25. A pair becomes a candidate with probability
+# 1 - (1 - J^3)^64: 0.83 at Jaccard 0.3, 0.94 at 0.35, 0.985 at 0.4 and 0.9998 at 0.5, but only 0.06 at 0.1.
+# 2 rows (threshold 0.125) made unrelated descriptions sharing a few common words candidates too, so scoring
+# grew quadratically with the corpus
+LSH_BANDS = 64
+MINHASH_PRIME = (1 << 61) - 1
+NEAR_DUPLICATE = 0.7  # Similarity of the lowest uniqueness bucket; no need to look further once reached
+
+@lru_cache(maxsize=100000)
+def content_tokens(description):
+    """Stop-word-free token set of a description, tokenized once per process."""
+    return frozenset(w for w in tokenize(description) if w not in stop_words)
+
+def description_tokens(description):
+    """content_tokens of a description, or of an AnalyzedDoc without tokenizing it again."""
+    return description.content_tokens if isinstance(description, AnalyzedDoc) else content_tokens(description)
+
+def jaccard(a, b):
+    return len(a & b) / (len(a | b) + 1e-5)
+
+def uniqueness_bucket(max_sim):
     if max_sim < 0.3:
         return 100
     elif max_sim < 0.5:
         return 70
-    elif max_sim < 0.7:
+    elif max_sim < NEAR_DUPLICATE:
         return 40
     else:
         return 10
 
+class UniquenessIndex:
+    """Near-duplicate lookup over a corpus of descriptions, built once per corpus.
+
+    Descriptions are reduced to their token sets once. Small corpora compare
+    every pair of distinct sets; from UNIQUENESS_LSH_MIN_CORPUS sets on,
+    MinHash signatures banded into an LSH table pick the candidate sets and
+    exact Jaccard is computed only for those. A description's score is one
+    bucket too high only if LSH misses every pair that put it in its bucket;
+    misses cluster just above the 0.3 edge (see LSH_BANDS), so it is rare and
+    practically never happens for near duplicates. ``score`` otherwise gives
+    the same buckets as uniqueness_score.
+    """
+
+    def __init__(self, all_descriptions, method='auto', permutations=MINHASH_PERMUTATIONS, bands=LSH_BANDS, seed=1):
+        # Identical strings are ignored against each other, so keep the distinct strings behind every token set
+        self.sets = {}
+        for description in all_descriptions:
+            self.sets.setdefault(description_tokens(description), set()).add(getattr(description, 'text', description))
+        self.size = sum(len(members) for members in self.sets.values())
+        if method == 'auto':
+            method = 'lsh' if len(self.sets) >= UNIQUENESS_LSH_MIN_CORPUS else 'exact'
+        self.method = method
+        self._nearest = {}
+        if method == 'lsh':
+            rng = random.Random(seed)
+            self.rows = permutations // bands
+            self._coefficients = [(rng.randrange(1, MINHASH_PRIME), rng.randrange(MINHASH_PRIME)) for _ in range(self.rows * bands)]
+            self._token_hashes = {}
+            self._buckets = [{} for _ in range(bands)]
+            self._keys = {}  # Band keys of the indexed sets, reused when they are scored
+            for token_set in self.sets:
+                self._keys[token_set] = self._band_keys(token_set)
+                for band, key in self._keys[token_set]:
+                    self._buckets[band].setdefault(key, []).append(token_set)
+
+    def _token_hash(self, token):
+        values = self._token_hashes.get(token)
+        if values is None:
+            h = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+            values = self._token_hashes[token] = [(a * h + b) % MINHASH_PRIME for a, b in self._coefficients]
+        return values
+
+    def _band_keys(self, token_set):
+        if not token_set:
+            return []  # An empty set is 0% similar to everything
+        signature = list(map(min, zip(*(self._token_hash(token) for token in token_set))))
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(len(self._buckets))]
+
+    def _candidates(self, token_set):
+        if self.method == 'exact':
+            yield from self.sets
+            return
+        keys = self._keys.get(token_set)
+        seen = set()
+        for band, key in keys if keys is not None else self._band_keys(token_set):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate not in seen:
+                    seen.add(candidate)
+                    yield candidate
+
+    def _nearest_other_set(self, token_set):
+        # Highest similarity to any other token set, stopping early once the near-duplicate bucket is certain
+        if token_set not in self._nearest:
+            best = 0.0
+            for candidate in self._candidates(token_set):
+                if candidate is token_set or candidate == token_set:
+                    continue
+                best = max(best, jaccard(token_set, candidate))
+                if best >= NEAR_DUPLICATE:
+                    break
+            self._nearest[token_set] = best
+        return self._nearest[token_set]
+
+    def score(self, description):
+        tokens = description_tokens(description)
+        description = getattr(description, 'text', description)
+        same_set = self.sets.get(tokens, ())
+        if self.size - (description in same_set) == 0:
+            return 100
+        best = self._nearest_other_set(tokens)
+        if any(other != description for other in same_set):
+            best = max(best, jaccard(tokens, tokens))
+        return uniqueness_bucket(best)
+
+def uniqueness_score(description, brand, all_descriptions=None, index=None):
+    if index is not None:
+        return index.score(description)
+    if not all_descriptions:
+        return 100
+    desc_tokens = description_tokens(description)
+    description = getattr(description, 'text', description)
+    similarities = []
+    for other in all_descriptions:
+        if getattr(other, 'text', other) == description:
+            continue
+        similarities.append(jaccard(desc_tokens, description_tokens(other)))
+    if not similarities:
+        return 100
+    return uniqueness_bucket(max(similarities))
+
 
 # 8. Readability Score
 def readability_score(description):
-    word_count = len(tokenize(description))
-    sentences = re.split(r'[.!?]', description)
-    avg_sentence_length = sum(len(tokenize(s)) for s in sentences if s.strip()) / (len(sentences) or 1)
+    doc = analyze(description)
+    word_count = len(doc.tokens)
+    avg_sentence_length = sum(doc.sentence_lengths) / (len(doc.sentences) or 1)
     wc_score = 20 if 50 <= word_count <= 150 else 0
     sl_score = 20 if 10 <= avg_sentence_length <= 20 else 0
     jargon = ["jacquard", "cambric", "fusionwear"]
-    simple_vocab = 30 if not any(j in description.lower() for j in jargon) else 15
-    para_score = 30 if '\n' in description else 15
-    try:
-        flesch = textstat.flesch_reading_ease(description)
-        if flesch < 30:
-            return 40
-        elif flesch < 60:
-            return 70
-        else:
-            return 100
-    except Exception:
+    simple_vocab = 30 if not any(j in doc.lower for j in jargon) else 15
+    para_score = 30 if '\n' in doc.text else 15
+    flesch = doc.flesch
+    if flesch is None:
         return min(wc_score + sl_score + simple_vocab + para_score, 100)
+    if flesch < 30:
+        return 40
+    elif flesch < 60:
+        return 70
+    else:
+        return 100
 
-def seo_scores(description, brand, keyword_map, all_descriptions=None):
+def seo_scores(description, brand, keyword_map, all_descriptions=None, uniqueness_index=None, density_mode=None):
+    """Score one description; pass a UniquenessIndex built over ``all_descriptions`` when scoring a whole brand."""
     brand = brand.strip().title()  # Normalize brand name
+    doc = analyze(description)
     return {
-        "keyword_density": keyword_density_score(description, brand, keyword_map),
-        "content_quality": content_quality_score(description),
-        "brand_consistency": brand_consistency_score(description, brand),
-        "uniqueness": uniqueness_score(description, brand, all_descriptions),
-        "readability": readability_score(description)
+        "keyword_density": keyword_density_score(doc, brand, keyword_map, density_mode),
+        "content_quality": content_quality_score(doc),
+        "brand_consistency": brand_consistency_score(doc, brand),
+        "uniqueness": uniqueness_score(doc, brand, all_descriptions, uniqueness_index),
+        "readability": readability_score(doc)
     }
+
+def seo_scores_batch(descriptions, brand, keyword_map, all_descriptions=None, uniqueness_index=None, density_mode=None):
+    """seo_scores for every description of one brand, analysing each distinct description once.
+
+    Uniqueness is measured against ``all_descriptions`` (``descriptions``
+    themselves by default) through one UniquenessIndex, unless one is given.
+    """
+    corpus = descriptions if all_descriptions is None else all_descriptions
+    docs = {text: AnalyzedDoc(text) for text in dict.fromkeys([*descriptions, *corpus])}
+    if uniqueness_index is None:
+        uniqueness_index = UniquenessIndex(docs[text] for text in corpus)
+    return [seo_scores(docs[text], brand, keyword_map, uniqueness_index=uniqueness_index, density_mode=density_mode)
+            for text in descriptions]